@@ -1,54 +1,42 @@
+import os
 import re
 import sys
 import getopt
+import multiprocessing
 
+# Cluster number of a gene, used as its ID
+CLUSTER = re.compile('cluster_number=CK_([0-9]+)')
 
-######################
-####     MAIN     ####
-######################
-
-if __name__ == "__main__":
-  try :
-    opts, args = getopt.getopt(sys.argv[1:], "hs:",["file="])
-  except getopt.GetoptError:
-    sys.exit()
-  file = None
-  for opt,arg in opts:
-    if(opt == "--file"):
-      file = arg
-  f = open(file, 'r')
+# Extracts the genes (with their orientation) and the sizes of the
+# intergenic regions of a GFF file.
+def extract(filename):
+  with open(filename, 'r') as f:
+    # Header lines
+    f.readline()
+    f.readline()
 
-  # Header lines
-  line = f.readline()
-  line = f.readline()
+    # Genome size (total of nucleotides)
+    genome_start, genome_end = [int(i) for i in f.readline().split('\t')[3:5]]
+    # Marks used to compute the sizes of the intergenic regions
+    marks = [genome_start]
+    # List of genes
+    genes = []
+    # IDs already mapped
+    seen = set()
 
-  # Genome size (total of nucleotides)
-  genome_start, genome_end = [int(i) for i in f.readline().split('\t')[3:5]]
-  # Marks used to compute the sizes of the intergenic regions
-  marks = [genome_start]
-  # List of genes
-  genes = []
-  # List for the genes orientation
-  strands = []
+    for line in f:
+      _, _, _, start, end, _, strand, _, attributes = line.split('\t')
 
-  line = f.readline()
-  while line:
-    _, _, _, start, end, _, strand, _, attributes = line.split('\t')
-
-    pattern = re.compile('cluster_number=CK_([0-9]+)')
-    matches = pattern.findall(attributes)
-    # If there is no ID for the gene, it is ignored
-    if len(matches):
-      id = int(matches[0])
-      # The first copy of each gene is mapped
-      if id not in genes:
-        genes.append(id)
-        strands.append(int(strand + '1'))
-        marks.append(int(start))
-        marks.append(int(end))
-
-    line = f.readline()
-  f.close()
+      match = CLUSTER.search(attributes)
+      # If there is no ID for the gene, it is ignored
+      if match:
+        id = int(match.group(1))
+        # The first copy of each gene is mapped, with its orientation
+        if id not in seen:
+          seen.add(id)
+          genes.append(id * int(strand + '1'))
+          marks.append(int(start))
+          marks.append(int(end))
 
   # Computing the sizes of the intergenic regions
   marks.append(genome_end)
@@ -56,12 +44,57 @@ if __name__ == "__main__":
   for i in range(1, len(marks), 2):
     intergenic_regions.append(max(marks[i] - marks[i - 1], 0))
 
-  # Assigning the gene orientation
-  for i in range(len(genes)):
-    genes[i] *= strands[i]
-
   # Checking the number of genes and intergenic regions
   if (len(genes) + 1)  != len(intergenic_regions):
     raise ValueError('It was detected an incompatible number of genes and intergenic regions.')
 
-  print(str(genes).replace(' ',''), str(intergenic_regions).replace(' ',''))
\ No newline at end of file
+  return genes, intergenic_regions
+
+def format_genome(genes, intergenic_regions):
+  return str(genes).replace(' ','') + ' ' + str(intergenic_regions).replace(' ','')
+
+# Extracts a GFF file into FILE.in, next to it
+def extract_to_file(filename):
+  genes, intergenic_regions = extract(filename)
+  with open(filename + '.in', 'w') as out:
+    out.write(format_genome(genes, intergenic_regions) + '\n')
+  return filename
+
+######################
+####     MAIN     ####
+######################
+
+# Usage:
+#   python3 extract.py --file FILE.gff  prints the extracted genome
+#   python3 extract.py --dir DIR [--jobs N]
+#                                       writes FILE.gff.in for every
+#                                       .gff file of DIR, using N
+#                                       processes (default: all CPUs)
+
+if __name__ == "__main__":
+  try :
+    opts, args = getopt.getopt(sys.argv[1:], "hs:",["file=", "dir=", "jobs="])
+  except getopt.GetoptError:
+    sys.exit()
+  file = None
+  directory = None
+  jobs = None
+  for opt,arg in opts:
+    if(opt == "--file"):
+      file = arg
+    if(opt == "--dir"):
+      directory = arg
+    if(opt == "--jobs"):
+      jobs = int(arg)
+
+  if directory is not None:
+    files = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                   if name.endswith('.gff'))
+    pool = multiprocessing.Pool(jobs)
+    for filename in pool.imap_unordered(extract_to_file, files):
+      print(filename + '.in')
+    pool.close()
+    pool.join()
+  else:
+    genes, intergenic_regions = extract(file)
+    print(format_genome(genes, intergenic_regions))
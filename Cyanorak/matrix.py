@@ -0,0 +1,135 @@
+import os
+import sys
+import getopt
+
+# NumPy is only needed to write the .npy file
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+# Distance matrices of the all-pairs runs. The row of a genome holds
+# its distances as the source genome, and its column the distances as
+# the target genome (the distance of a pair may depend on the
+# direction). A pair without a distance is written as -1.
+#
+# The matrix is written as PREFIX.npy (int64, if NumPy is available),
+# PREFIX.phy (PHYLIP square matrix, with the genome names in full) and
+# PREFIX.tsv (a header with the names, then one row per genome).
+
+MISSING = -1
+
+# Name of a genome given any of its files (NAME.gff, NAME.gff.in)
+def genome_name(filename):
+  name = os.path.basename(filename)
+  for extension in ('.in', '.gff'):
+    if name.endswith(extension):
+      name = name[:-len(extension)]
+  return name
+
+# Builds the matrix of the given genomes from a dictionary mapping
+# (source, target) to the distance of the pair
+def build_matrix(names, distances):
+  return [[distances.get((source, target), MISSING) for target in names] for source in names]
+
+def write_npy(filename, matrix):
+  numpy.save(filename, numpy.array(matrix, dtype=numpy.int64))
+
+def write_phylip(filename, names, matrix):
+  width = max([10] + [len(name) + 1 for name in names])
+  f = open(filename, 'w')
+  f.write('%d\n' % len(names))
+  for name, row in zip(names, matrix):
+    f.write(name.ljust(width) + ' '.join(str(d) for d in row) + '\n')
+  f.close()
+
+def write_tsv(filename, names, matrix):
+  f = open(filename, 'w')
+  f.write('\t'.join([''] + names) + '\n')
+  for name, row in zip(names, matrix):
+    f.write('\t'.join([name] + [str(d) for d in row]) + '\n')
+  f.close()
+
+# Writes every format of the matrix, returning the files written. The
+# .npy file is skipped (with a warning) if NumPy is not installed.
+def write_matrix(prefix, names, matrix):
+  written = []
+  if numpy is not None:
+    write_npy(prefix + '.npy', matrix)
+    written.append(prefix + '.npy')
+  else:
+    sys.stderr.write('NumPy is not installed, %s.npy was not written\n' % prefix)
+  write_phylip(prefix + '.phy', names, matrix)
+  write_tsv(prefix + '.tsv', names, matrix)
+  return written + [prefix + '.phy', prefix + '.tsv']
+
+# Reads the distances of a directory with one SOURCE.gff.in-X-TARGET.gff.in.pairwise.out.dist
+# file per pair (as INDEL-INTERGENIC-OUTPUT), returning the names of the
+# genomes and the distances
+def read_dist_dir(directory):
+  distances = {}
+  names = set()
+  for filename in os.listdir(directory):
+    if not filename.endswith('.pairwise.out.dist'):
+      continue
+    source, target = filename[:-len('.pairwise.out.dist')].split('-X-')
+    source, target = genome_name(source), genome_name(target)
+    f = open(os.path.join(directory, filename), 'r')
+    distances[(source, target)] = int(f.read().split()[0])
+    f.close()
+    names.add(source)
+    names.add(target)
+  return sorted(names), distances
+
+# Reads the distances of a pair table written by pipeline.py, returning
+# the names of the genomes and the distances
+def read_table(filename):
+  distances = {}
+  names = []
+  f = open(filename, 'r')
+  f.readline() # Header
+  for line in f:
+    source, target, distance = line.split()[:3]
+    distances[(source, target)] = int(distance)
+    # Every genome is a source, in the order of the table
+    if source not in names:
+      names.append(source)
+  f.close()
+  return names, distances
+
+######################
+####     MAIN     ####
+######################
+
+# Usage:
+#   python3 matrix.py --dist-dir DIR --output PREFIX
+#       builds the matrix of the .out.dist files of DIR
+#   python3 matrix.py --table FILE --output PREFIX
+#       builds the matrix of a pair table written by pipeline.py
+
+if __name__ == "__main__":
+  try :
+    opts, args = getopt.getopt(sys.argv[1:], "h",["dist-dir=", "table=", "output="])
+  except getopt.GetoptError:
+    sys.exit()
+  directory = None
+  table = None
+  output = None
+  for opt,arg in opts:
+    if(opt == "--dist-dir"):
+      directory = arg
+    if(opt == "--table"):
+      table = arg
+    if(opt == "--output"):
+      output = arg
+
+  if output is None or (directory is None) == (table is None):
+    print("Usage: python3 matrix.py (--dist-dir DIR | --table FILE) --output PREFIX")
+    sys.exit(2)
+
+  if directory is not None:
+    names, distances = read_dist_dir(directory)
+  else:
+    names, distances = read_table(table)
+  for filename in write_matrix(output, names, build_matrix(names, distances)):
+    print(filename)
@@ -1,106 +1,206 @@
+import os
 import sys
 import getopt
+import itertools
+import multiprocessing
 
+# Parses a list of integers written as "[1,-2,3]" (as in the files
+# produced by extract.py) without eval.
+def parse_list(field):
+  field = field.strip().strip("[]").rstrip(",")
+  if not field:
+    return []
+  return list(map(int, field.split(",")))
+
+# Reads a genome extracted by extract.py, returning its genes and the
+# sizes of its intergenic regions
+def read_genome(filename):
+  f = open(filename, 'r')
+  genes, ir = [parse_list(i) for i in f.readline().split()]
+  f.close()
+  return genes, ir
+
+# Maps the target genome as the identity permutation (not reduced yet).
+# It only depends on the target, so it can be computed once and used
+# for every source.
+def target_map(target_genes):
+  map = {}
+  index = 1
+  for i in range(len(target_genes)):
+    map[target_genes[i]] = index
+    index += 1
+  return map
+
+# Reduces the pair of genomes, returning the instance (pi, pi_ir,
+# iota_ir). The lists given are not modified.
+#
+# The source genome is mapped according to the target (a gene not
+# present in the target genome is mapped to zero, indicating that it
+# must be removed) and split into conserved blocks, maximal runs where
+# each gene is equal to the previous one or to the previous one plus
+# one. Each block becomes one gene of pi: its first gene if negative,
+# otherwise its last one. The target genome is reduced to the blocks
+# with some gene present in it, plus one gene for each gap between two
+# of them, in increasing order of their genes.
+#
+# Everything is done in a single pass over each genome. A block is
+# only kept as the interval [lo, hi] of the (absolute) target genes
+# it covers, stored at position lo of a list, so the blocks are
+# visited in order without sorting them. The interval is given by the
+# ends of the block: a zero can only be next to gene 1 or -1 (a block
+# such as [0,0,1,2] or [-2,-1,0]), so lo is 1 when one of the ends is
+# zero, and a block with two zero ends has only zeros.
+def reduce_pair(source_genes, source_ir, target_ir, map):
+  get = map.get
+  mapped = [get(gene) or -get(-gene, 0) for gene in source_genes]
+
+  # Computing the breakpoints, the first gene of each block
+  breaks = [i + 1 for i, (a, b) in enumerate(zip(mapped, mapped[1:])) if (b - a) not in (0, 1)]
+  breaks = [0] + breaks + [len(mapped)]
+
+  pi = []
+  # The intergenic region before each block, and the last one
+  pi_ir = [source_ir[i] for i in breaks]
+  # block_end[lo] is the hi of the block starting at lo, or zero
+  block_end = [0] * (len(target_ir) + 1)
+  for start, end in zip(breaks, breaks[1:]):
+    first, last = mapped[start], mapped[end - 1]
+    if first < 0:
+      pi.append(first)
+    else:
+      pi.append(last)
+    first, last = abs(first), abs(last)
+    if first and last:
+      block_end[min(first, last)] = max(first, last)
+    elif first or last:
+      block_end[1] = first or last
+
+  # Reducing process of the target genome, and mapping it as the
+  # identity permutation (reduced instance)
+  iota_ir = [target_ir[0]]
+  rank = [0] * (len(target_ir) + 1)
+  count = 0
+  previous = 0
+  for lo in itertools.compress(range(len(block_end)), block_end):
+    hi = block_end[lo]
+    if previous and lo - previous != 1:
+      count += 1
+      iota_ir.append(target_ir[lo - 1])
+    count += 1
+    rank[hi] = count
+    iota_ir.append(target_ir[hi])
+    previous = hi
+
+  # Mapping the source genome according to the target
+  pi = [rank[g] if g > 0 else -rank[-g] for g in pi]
+
+  return pi, pi_ir, iota_ir
+
+def format_instance(pi, pi_ir, iota_ir):
+  return str(pi).replace(' ','') + ' ' + str(pi_ir).replace(' ','') + ' ' + str(iota_ir).replace(' ','')
+
+# Name of the file of a pair, as in INDEL-INTERGENIC
+def pair_filename(source_filename, target_filename):
+  return '%s-X-%s.pairwise' % (os.path.basename(source_filename), os.path.basename(target_filename))
+
+######################
+####  ALL PAIRS   ####
+######################
+
+# Genomes and target maps of the all-pairs mode. Each worker reads
+# every genome and builds every target map once, in pool_init.
+genomes = []
+
+def pool_init(filenames):
+  del genomes[:]
+  for filename in filenames:
+    genes, ir = read_genome(filename)
+    genomes.append((filename, genes, ir, target_map(genes)))
+
+# Reduces a source genome against every target, returning the
+# (source, target, instance line) of each pair
+def reduce_row(source):
+  source_filename, source_genes, source_ir, _ = genomes[source]
+  row = []
+  for target_filename, _, target_ir, map in genomes:
+    line = format_instance(*reduce_pair(source_genes, source_ir, target_ir, map))
+    row.append((source_filename, target_filename, line))
+  return row
+
+# Reduces every ordered pair of the genomes (including each genome
+# against itself). Each source is a task for the pool of jobs
+# processes. The instances are written to output_dir, one file per
+# pair named as in INDEL-INTERGENIC, or to the file output (one
+# instance per line, ordered by source and then by target, as the
+# filenames given), or printed.
+def all_pairs(filenames, jobs = None, output_dir = None, output = None):
+  pool = multiprocessing.Pool(jobs, pool_init, (filenames,))
+  out = sys.stdout
+  if output is not None:
+    out = open(output, 'w')
+
+  for row in pool.imap(reduce_row, range(len(filenames))):
+    for source_filename, target_filename, line in row:
+      if output_dir is not None:
+        f = open(os.path.join(output_dir, pair_filename(source_filename, target_filename)), 'w')
+        f.write(line + '\n')
+        f.close()
+      else:
+        out.write(line + '\n')
+
+  if out is not sys.stdout:
+    out.close()
+  pool.close()
+  pool.join()
 
 ######################
 ####     MAIN     ####
 ######################
 
+# Usage:
+#   python3 pairwise.py --source FILE.gff.in --target FILE.gff.in
+#       prints the reduced instance of the pair
+#   python3 pairwise.py --all DIR [--jobs N] [--output-dir D | --output F]
+#       reduces every ordered pair of the .gff.in files of DIR using
+#       N processes (default: all CPUs), writing one file per pair into
+#       D (as in INDEL-INTERGENIC) or every instance into F, ordered by
+#       source and target name. The instances are printed otherwise.
+
 if __name__ == "__main__":
   try :
-    opts, args = getopt.getopt(sys.argv[1:], "hs:",["source=", "target="])
+    opts, args = getopt.getopt(sys.argv[1:], "hs:",["source=", "target=", "all=", "jobs=",
+                                                   "output-dir=", "output="])
   except getopt.GetoptError:
     sys.exit()
   source_filename = None
   target_filename = None
+  directory = None
+  jobs = None
+  output_dir = None
+  output = None
   for opt,arg in opts:
     if(opt == "--source"):
       source_filename = arg
     if(opt == "--target"):
       target_filename = arg
+    if(opt == "--all"):
+      directory = arg
+    if(opt == "--jobs"):
+      jobs = int(arg)
+    if(opt == "--output-dir"):
+      output_dir = arg
+    if(opt == "--output"):
+      output = arg
 
-  # Reading the extracted files
-  f = open(source_filename, 'r')
-  source_genes, source_ir = [eval(i) for i in f.readline().split()]
-  f.close()
-  f = open(target_filename, 'r')
-  target_genes, target_ir = [eval(i) for i in f.readline().split()]
-  f.close()
-
-  # Mapping the target genome as the identity permutation (not reduced yet)
-  map = {}
-  index = 1
-  for i in range(len(target_genes)):
-    map[target_genes[i]] = index
-    target_genes[i] = index
-    index += 1
-
-  # Mapping the source genome according to the target
-  # If a gene is not present in the target genome the value zero is assigned (indicating that must be removed).
-  for i in range(len(source_genes)):
-    if source_genes[i] in map.keys():
-      source_genes[i] = map[source_genes[i]]
-    elif -source_genes[i] in map.keys():
-      source_genes[i] = -map[-source_genes[i]]
-    else:
-      source_genes[i] = 0
-
-  # Computing the breakpoints, it will be used to reduce the source genome (mapping conserved conserved blocks into a gene)
-  breaks = []
-  for i in range(len(source_genes) - 1):
-    if (source_genes[i + 1] - source_genes[i]) not in [0,1]:
-      breaks.append(i + 1)
-  breaks = [0] + breaks + [len(source_genes)]
-  blocks = []
-
-  # Reducing process of the source genome
-  pi = []
-  pi_ir = [source_ir[0]]
-  for i in range(len(breaks) - 1):
-    if source_genes[breaks[i]] < 0:
-      pi.append(source_genes[breaks[i]])
-      b = [abs(g) for g in source_genes[breaks[i]:breaks[i + 1]]]
-      b.reverse()
-      blocks.append(b)
-    else:
-      pi.append(source_genes[breaks[i + 1] - 1])
-      b = source_genes[breaks[i]:breaks[i + 1]]
-      blocks.append(b)
-    pi_ir.append(source_ir[breaks[i + 1]])
-
-  # The blocks are used to reduce the target genome
-  blocks = sorted([i for i in blocks if sum(i) != 0])
-  aux = []
-  for i in range(len(blocks) - 1):
-    if min(blocks[i + 1]) - max(blocks[i]) != 1:
-      aux.append(list(range(max(blocks[i]) + 1, min(blocks[i + 1]))))
-  blocks = sorted(blocks + aux)
-
-  # Reducing process of the target genome
-  iota = []
-  iota_ir = [target_ir[0]]
-  for b in blocks:
-    i = max(b)
-    iota.append(i)
-    iota_ir.append(target_ir[i])
-
-  # Mapping the target genome as the identity permutation (reduced instance)
-  map = {}
-  index = 1
-  for i in range(len(iota)):
-    map[iota[i]] = index
-    iota[i] = index
-    index += 1
+  if directory is not None:
+    filenames = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                       if name.endswith('.gff.in'))
+    all_pairs(filenames, jobs, output_dir, output)
+    sys.exit()
 
-  # Mapping the source genome according to the target
-  for i in range(len(pi)):
-    if pi[i] in map.keys():
-      pi[i] = map[pi[i]]
-    elif -pi[i] in map.keys():
-      pi[i] = -map[-pi[i]]
-    else:
-      pi[i] = 0
+  # Reading the extracted files
+  source_genes, source_ir = read_genome(source_filename)
+  target_genes, target_ir = read_genome(target_filename)
 
   # Output
-  print(str(pi).replace(' ',''), str(pi_ir).replace(' ',''), str(iota_ir).replace(' ',''))
-  # print(str(iota).replace(' ',''), str(iota_ir).replace(' ',''))
\ No newline at end of file
+  print(format_instance(*reduce_pair(source_genes, source_ir, target_ir, target_map(target_genes))))
@@ -0,0 +1,223 @@
+import os
+import sys
+import time
+import getopt
+import multiprocessing
+
+import extract
+import matrix
+import pairwise
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rev_indel_intergenic import sort_instance_result
+import result_cache
+
+# Runs the whole real-data experiment in memory: every GFF file is
+# extracted (as extract.py does), every ordered pair of genomes is
+# reduced (as pairwise.py does) and sorted (as rev_indel_intergenic.py
+# does). Only the results are written: a table with one line per pair,
+#   SOURCE TARGET DISTANCE REVERSALS INSERTIONS DELETIONS SECONDS ORIENTATION CACHED
+# where SOURCE and TARGET are the names of the GFF files without the
+# .gff extension, ordered by source and then by target, and/or the
+# distance matrix (see matrix.py).
+#
+# A pair of identical genomes is not sorted, its distance is zero. In
+# the symmetric mode only one orientation of each pair is sorted: the
+# source is the genome that comes first in name order. The other
+# orientation gets the results of the inverse sequence of operations,
+# which has the same distance and reversals, with the insertions and
+# deletions exchanged. ORIENTATION tells whether the
+# pair was "sorted", "identical" or "mirrored" from the other one.
+# CACHED is "yes" if the result of the pair (or of the other one, for a
+# mirrored pair) was taken from the cache, with the time of the
+# sorting that stored it, and "no" otherwise.
+
+# Genomes (name, genes, intergenic regions, target map) of the workers,
+# set by pool_init
+genomes = []
+
+def pool_init(extracted):
+  del genomes[:]
+  for name, genes, ir in extracted:
+    genomes.append((name, genes, ir, pairwise.target_map(genes)))
+
+# Operations counted in the table
+OPERATIONS = ("REV", "INS", "DEL")
+
+# Reduces and sorts a source genome against every target (or only the
+# ones after it, in the symmetric mode). Returns the (target,
+# statistics, orientation, instance, result) of each pair, where
+# statistics are the distance, the number of each operation and the
+# time spent sorting. The cache, if any, is given as (filename,
+# maximum size) and opened once by each worker, the new results of a
+# row are written when the row is done. The number of an
+# operation is None if it is not known (a result sorted with
+# distance_only and taken from the cache).
+def sort_row(task):
+  source, is_3approx, symmetric, cache, distance_only = task
+  if cache is not None:
+    cache = result_cache.open_cache(*cache)
+  _, source_genes, source_ir, _ = genomes[source]
+  row = []
+  for target in range(len(genomes)):
+    if symmetric and target < source:
+      continue
+    _, target_genes, target_ir, map = genomes[target]
+    if target_genes == source_genes and target_ir == source_ir:
+      # Identical genomes are at distance zero
+      row.append((target, (0, 0, 0, 0, 0.0), 'identical', None, None))
+      continue
+    pi, pi_ir, iota_ir = pairwise.reduce_pair(source_genes, source_ir, target_ir, map)
+    result = sort_instance_result(pi, pi_ir, iota_ir, is_3approx, time.time(), cache,
+                                  distance_only = distance_only)
+    statistics = tuple([result.distance] + [result.count(op) for op in OPERATIONS] + [result.seconds])
+    row.append((target, statistics, 'sorted', (pi, pi_ir, iota_ir), result))
+  if cache is not None:
+    cache.flush()
+  return row
+
+# Statistics of the other orientation of a pair: an insertion from the
+# source to the target is a deletion from the target to the source
+def mirror(statistics):
+  distance, reversals, insertions, deletions, seconds = statistics
+  return (distance, reversals, deletions, insertions, seconds)
+
+# Writes the files of the old three-step workflow into directory, to
+# debug the pipeline against it: NAME.gff.in for each genome and
+# SOURCE.gff.in-X-TARGET.gff.in.pairwise(.out) for each pair.
+def write_genome(directory, name, genes, ir):
+  f = open(os.path.join(directory, name + '.gff.in'), 'w')
+  f.write(extract.format_genome(genes, ir) + '\n')
+  f.close()
+
+def write_pair(directory, source_name, target_name, instance, result):
+  filename = os.path.join(directory, pairwise.pair_filename(source_name + '.gff.in', target_name + '.gff.in'))
+  f = open(filename, 'w')
+  f.write(pairwise.format_instance(*instance) + '\n')
+  f.close()
+  f = open(filename + '.out', 'w')
+  f.write(result.line() + '\n')
+  f.close()
+
+# Sorts every pair of the GFF files, writing the table into output
+# and the distance matrix into matrix_prefix.* (any of them can be
+# None). The cache, if any, is given as (filename, maximum size in
+# bytes). With distance_only the pairs are sorted without keeping the
+# sequences of operations (see rev_indel_intergenic.Intergenic_Rev).
+def pipeline(filenames, output, is_3approx = False, jobs = None, intermediate = None,
+             matrix_prefix = None, symmetric = False, cache = None, distance_only = False):
+  pool = multiprocessing.Pool(jobs)
+  names = [matrix.genome_name(filename) for filename in filenames]
+  extracted = [(name, genes, ir) for name, (genes, ir) in zip(names, pool.map(extract.extract, filenames))]
+  pool.close()
+  pool.join()
+
+  if intermediate is not None:
+    for name, genes, ir in extracted:
+      write_genome(intermediate, name, genes, ir)
+
+  pool = multiprocessing.Pool(jobs, pool_init, (extracted,))
+  pairs = {}
+  tasks = [(source, is_3approx, symmetric, cache, distance_only) for source in range(len(extracted))]
+  for source, row in enumerate(pool.imap(sort_row, tasks)):
+    for target, statistics, orientation, instance, result in row:
+      cached = result is not None and result.cached
+      pairs[(source, target)] = (statistics, orientation, cached)
+      if symmetric and target != source:
+        if orientation == 'sorted':
+          orientation = 'mirrored'
+        pairs[(target, source)] = (mirror(statistics), orientation, cached)
+      if intermediate is not None and result is not None:
+        write_pair(intermediate, names[source], names[target], instance, result)
+  pool.close()
+  pool.join()
+
+  if output is not None:
+    out = open(output, 'w')
+    out.write('source target distance reversals insertions deletions seconds orientation cached\n')
+    for source in range(len(names)):
+      for target in range(len(names)):
+        statistics, orientation, cached = pairs[(source, target)]
+        counts = tuple('-' if count is None else count for count in statistics[1:4])
+        out.write('%s %s %d %s %s %s %f %s %s\n' % ((names[source], names[target], statistics[0]) + counts +
+                                                   (statistics[4], orientation, 'yes' if cached else 'no')))
+    out.close()
+
+  distances = {}
+  for (source, target), (statistics, _, _) in pairs.items():
+    distances[(names[source], names[target])] = statistics[0]
+
+  if matrix_prefix is not None:
+    matrix.write_matrix(matrix_prefix, names, matrix.build_matrix(names, distances))
+
+######################
+####     MAIN     ####
+######################
+
+# Usage:
+#   python3 pipeline.py --dir DIR [--output TABLE] [--matrix PREFIX]
+#                       [--3approx] [--symmetric] [--jobs N] [--intermediate D]
+#                       [--cache FILE] [--cache-size M] [--distance-only]
+# sorts every ordered pair of the .gff files of DIR using N processes
+# (default: all CPUs) and writes the table of pairs into TABLE and/or
+# the distance matrix into PREFIX.npy, PREFIX.phy and PREFIX.tsv. With
+# --symmetric only one orientation of each pair is sorted. With
+# --intermediate the .gff.in, .pairwise and .pairwise.out files of the
+# sorted pairs are also written into D. With --cache the results are
+# kept in FILE and reused from there, which may be the cache of
+# rev_indel_intergenic.py --batch (see result_cache.py). With
+# --distance-only the sequences of
+# operations are not kept, which is faster: the .pairwise.out files
+# then have "-" instead of the input and the sequence, and the numbers
+# of operations of results taken from the cache may be unknown ("-").
+
+if __name__ == "__main__":
+  try :
+    opts, args = getopt.getopt(sys.argv[1:], "h",["dir=", "output=", "3approx", "jobs=",
+                                                 "intermediate=", "matrix=", "symmetric",
+                                                 "cache=", "cache-size=",
+                                                 "distance-only"])
+  except getopt.GetoptError:
+    sys.exit()
+  directory = None
+  output = None
+  is_3approx = False
+  jobs = None
+  intermediate = None
+  matrix_prefix = None
+  symmetric = False
+  distance_only = False
+  cache_filename, cache_size = None, result_cache.DEFAULT_MAX_SIZE
+  for opt,arg in opts:
+    if(opt == "--dir"):
+      directory = arg
+    if(opt == "--output"):
+      output = arg
+    if(opt == "--3approx"):
+      is_3approx = True
+    if(opt == "--jobs"):
+      jobs = int(arg)
+    if(opt == "--intermediate"):
+      intermediate = arg
+    if(opt == "--matrix"):
+      matrix_prefix = arg
+    if(opt == "--symmetric"):
+      symmetric = True
+    if(opt == "--cache"):
+      cache_filename = arg
+    if(opt == "--cache-size"):
+      cache_size = int(arg) * 1024 * 1024
+    if(opt == "--distance-only"):
+      distance_only = True
+
+  if directory is None or (output is None and matrix_prefix is None):
+    print("Usage: python3 pipeline.py --dir DIR [--output TABLE] [--matrix PREFIX] [--3approx] [--jobs N] [--intermediate D]")
+    sys.exit(2)
+
+  filenames = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                     if name.endswith('.gff'))
+  cache = None
+  if cache_filename is not None:
+    cache = (cache_filename, cache_size)
+  pipeline(filenames, output, is_3approx, jobs, intermediate, matrix_prefix, symmetric, cache,
+           distance_only)
@@ -0,0 +1,119 @@
+import os
+import sys
+import getopt
+import multiprocessing
+
+from generate_instance import sequential, check
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from instance_format import InstanceWriter
+
+# Builds the simulated datasets in one process tree, replacing the
+# run_*.sh loops. For each k and size, input_<k>/<size>.in gets the
+# given number of instances of that size built with k% of the size
+# operations of each type (reversals, deletions and insertions), that
+# is, generate_instance.py is called with number_op = 3*(k*size/100).
+# Each file uses the stream seeded with 1501, as each call of
+# generate_instance.py did, so the defaults rebuild input_10, input_30,
+# input_50 and input_100.
+#
+# Usage: python3 build_datasets.py [--sizes S] [--k K] [--instances N]
+#                                  [--jobs J] [--output-dir D] [--binary]
+#   --sizes      sizes, as a comma-separated list where each item is a
+#                size or an inclusive range START:END:STEP
+#                (default 10:500:10)
+#   --k          values of k, as the sizes (default 10,30,50,100)
+#   --instances  instances per file (default 10000)
+#   --jobs       number of processes (default: all CPUs)
+#   --output-dir directory where input_<k> are created (default: the
+#                directory of this script)
+#   --binary     writes <size>.bin files (see instance_format.py)
+#                instead of text
+
+# Lines written at a time
+BUFFER = 1000
+
+def parse_values(text):
+    values = []
+    for item in text.split(','):
+        if ':' in item:
+            start, end, step = [int(i) for i in item.split(':')]
+            values.extend(range(start, end + 1, step))
+        else:
+            values.append(int(item))
+    return values
+
+def number_of_operations(k, size):
+    return 3 * (k * size // 100)
+
+# Writes one file, under a temporary name renamed at the end, so an
+# interrupted build never leaves a partial dataset.
+def build(task):
+    k, size, instances, output_dir, binary = task
+    directory = os.path.join(output_dir, 'input_%d' % k)
+    os.makedirs(directory, exist_ok=True)
+    filename = os.path.join(directory, '%d.%s' % (size, 'bin' if binary else 'in'))
+    temporary = filename + '.tmp'
+
+    if binary:
+        out = InstanceWriter(temporary)
+    else:
+        out = open(temporary, 'w')
+    lines = []
+    for pi, breve_pi, breve_iota in sequential(instances, size, number_of_operations(k, size)):
+        error = check(pi, breve_pi, size)
+        if error:
+            out.close()
+            os.remove(temporary)
+            raise ValueError('%s: %s' % (filename, error))
+        if binary:
+            out.write(pi, breve_pi, breve_iota)
+            continue
+        lines.append('%s %s %s\n' % (','.join(map(str, pi)), ','.join(map(str, breve_pi)),
+                                     ','.join(map(str, breve_iota))))
+        if len(lines) == BUFFER:
+            out.writelines(lines)
+            lines = []
+    if not binary:
+        out.writelines(lines)
+    out.close()
+    os.replace(temporary, filename)
+    return filename
+
+if __name__ == '__main__':
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "", ["sizes=", "k=", "instances=", "jobs=",
+                                                      "output-dir=", "binary"])
+    except getopt.GetoptError as err:
+        print(err)
+        sys.exit(2)
+
+    sizes = list(range(10, 501, 10))
+    ks = [10, 30, 50, 100]
+    instances = 10000
+    jobs = None
+    output_dir = os.path.dirname(os.path.abspath(__file__))
+    binary = False
+    for opt, arg in opts:
+        if opt == "--sizes":
+            sizes = parse_values(arg)
+        if opt == "--k":
+            ks = parse_values(arg)
+        if opt == "--instances":
+            instances = int(arg)
+        if opt == "--jobs":
+            jobs = int(arg)
+        if opt == "--output-dir":
+            output_dir = arg
+        if opt == "--binary":
+            binary = True
+
+    # The largest files first, so that no process is left with a large
+    # file at the end
+    tasks = [(k, size, instances, output_dir, binary) for k in ks for size in sizes]
+    tasks.sort(key=lambda task: -task[0] * task[1])
+
+    pool = multiprocessing.Pool(jobs)
+    for filename in pool.imap_unordered(build, tasks):
+        print(filename)
+    pool.close()
+    pool.join()
@@ -1,101 +1,161 @@
 import numpy as np
 import sys
-
-def next(pi, index):
-    if index == len(pi)-1:
-        return -1
-    return abs(pi[index + 1])
-
-def previous(pi, index):
-    if index == 0:
-        return -1
-    return abs(pi[index - 1])
-
-instances = int(sys.argv[1])
-size = int(sys.argv[2])
-number_op = int(sys.argv[3])
+import os
+import getopt
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from instance_format import InstanceWriter
+
+# Usage: python3 generate_instance.py [--workers N] [--chunk C] instances size number_op [output]
+#
+# Prints (or writes into the binary file output, see instance_format.py)
+# the given number of instances of the given size, each one built from
+# the identity by number_op/3 reversals, deletions and insertions.
+#
+# By default a single random stream seeded with 1501 is used, which
+# reproduces the datasets of input_*. With --workers the instances are
+# split into chunks of C instances (default 1000), each one with its
+# own stream seeded by (1501, chunk number), and the chunks are built
+# by N processes. The output then depends on C but not on N.
 
 seed = 1501
 
-np.random.seed(seed)
-
 min_size = 0
 max_size = 100
 
-for _ in range(instances):
-    pi = list(range(1,size + 1))
-    breve_iota = list()
-
-    for _ in range(size + 1):
-        breve_iota.append(np.random.randint(min_size, max_size+1))    
-
-    breve_pi = [x for x in breve_iota]
+# Builds one instance, drawing the random numbers from rng in the same
+# order as the original generator. The genome is changed in place:
+# a reversal reverses the slice, and deletions and insertions only
+# move the tail of the lists. present[g] tells whether gene g (or -g)
+# is still in pi, so the deletion test does not scan pi.
+def generate(rng, size, number_op):
+    pi = list(range(1, size + 1))
+    breve_iota = rng.randint(min_size, max_size+1, size=size + 1).tolist()
 
-    # print(pi)
-    # print(breve_pi)
+    breve_pi = list(breve_iota)
 
     for _ in range(int(number_op/3)):
-        i = np.random.randint(0, len(pi))
-        j = np.random.randint(min(len(pi)-1,i+1), len(pi))
-        x = np.random.randint(0, max(1, breve_pi[i]))
-        y = np.random.randint(0, max(1, breve_pi[j+1]))
+        i = rng.randint(0, len(pi))
+        j = rng.randint(min(len(pi)-1,i+1), len(pi))
+        x = rng.randint(0, max(1, breve_pi[i]))
+        y = rng.randint(0, max(1, breve_pi[j+1]))
         x_prime = breve_pi[i] - x
         y_prime = breve_pi[j+1] - y
 
-        segment = pi[i:j+1]
-        segment.reverse()
-        segment = [x*-1 for x in segment]
-        segment_breve = breve_pi[i+1:j+1]#segment from i+1 to j
-        segment_breve.reverse()
-
-        pi = pi[0:i] + segment + pi[j+1:len(pi)+1]
-
+        pi[i:j+1] = [-g for g in reversed(pi[i:j+1])]
+        breve_pi[i+1:j+1] = breve_pi[j:i:-1]
         breve_pi[i] = x + y
         breve_pi[j+1] = x_prime + y_prime
-        breve_pi = breve_pi[0:i+1] + segment_breve + breve_pi[j+1:len(breve_pi)+1]
+
+    present = bytearray(size + 2)
+    for g in pi:
+        present[abs(g)] = 1
 
     for _ in range(int(number_op/3)):
-        index = np.random.randint(0, len(pi))
-        x = np.random.randint(0, max(1,breve_pi[index]))
-        y = np.random.randint(0, max(1,breve_pi[index+1]))
-        # print(index, x, y)
-        if (pi[index]-1 in [abs(x) for x in pi]) and (pi[index]+1 in [abs(x) for x in pi]):
+        index = rng.randint(0, len(pi))
+        x = rng.randint(0, max(1,breve_pi[index]))
+        y = rng.randint(0, max(1,breve_pi[index+1]))
+        # pi has no zero yet, so pi[index]-1 can only be present if pi[index] > 1
+        g = pi[index]
+        if g > 1 and present[g-1] and present[g+1]:
             y_prime = breve_pi[index+1] - y
-            pi = pi[0:index] + pi[index+1:len(pi)+1]
-            breve_pi = breve_pi[0:index] + [x + y_prime] + breve_pi[index+2:len(breve_pi)+1]
+            present[g] = 0
+            del pi[index]
+            breve_pi[index:index+2] = [x + y_prime]
 
     for _ in range(int(number_op/3)):
-        pre = np.random.randint(min_size, max_size+1)
-        post = np.random.randint(min_size, max_size+1)
-        index = np.random.randint(0, len(pi))
-        x = np.random.randint(0, max(1,breve_pi[index]))
+        pre = rng.randint(min_size, max_size+1)
+        post = rng.randint(min_size, max_size+1)
+        index = rng.randint(0, len(pi))
+        x = rng.randint(0, max(1,breve_pi[index]))
         x_prime = breve_pi[index] - x
-        if (previous(pi, index) != 0 and pi[index] != 0):
-            pi = pi[0:index] + [0] + pi[index:len(pi)+1]
+        if (index == 0 or pi[index-1] != 0) and pi[index] != 0:
+            pi.insert(index, 0)
             breve_pi[index] = x + pre
-            breve_pi = breve_pi[0:index+1] + [x_prime + post] + breve_pi[index+1:len(breve_pi)+1]
+            breve_pi.insert(index+1, x_prime + post)
 
+    return pi, breve_pi, breve_iota
 
-    #check instance
+# Checks an instance, returning the error found (or None)
+def check(pi, breve_pi, size):
     if(len(pi)+1 != len(breve_pi)):
-        print("Size error")
-        exit()
-    
-    abs_pi = [abs(x) for x in pi]
+        return "Size error"
+
+    present = bytearray(size + 2)
+    for g in pi:
+        present[abs(g)] = 1
     for i in range(1, size, 2):
-        if i not in abs_pi and i+1 not in abs_pi:
-            print("insertion error")
-            exit()
+        if not present[i] and not present[i+1]:
+            return "insertion error"
 
     for i in range(len(pi)-1):
         if pi[i] == 0 and pi[i+1] == 0:
-            print("deletion error")
-            print(pi)
+            return "deletion error\n%s" % pi
+
+    return None
+
+# Builds the instances of a chunk (see --workers)
+def generate_chunk(task):
+    chunk, count, size, number_op = task
+    rng = np.random.RandomState(np.random.MT19937(np.random.SeedSequence([seed, chunk])))
+    return [generate(rng, size, number_op) for _ in range(count)]
+
+def sequential(instances, size, number_op):
+    rng = np.random.RandomState(seed)
+    for _ in range(instances):
+        yield generate(rng, size, number_op)
+
+def parallel(instances, size, number_op, workers, chunk_size):
+    tasks = [(chunk, min(chunk_size, instances - start), size, number_op)
+             for chunk, start in enumerate(range(0, instances, chunk_size))]
+    pool = multiprocessing.Pool(workers)
+    for chunk in pool.imap(generate_chunk, tasks):
+        for instance in chunk:
+            yield instance
+    pool.close()
+    pool.join()
+
+if __name__ == '__main__':
+    opts, args = getopt.gnu_getopt(sys.argv[1:], "", ["workers=", "chunk="])
+    workers = None
+    chunk_size = 1000
+    for opt, arg in opts:
+        if opt == "--workers":
+            workers = int(arg)
+        if opt == "--chunk":
+            chunk_size = int(arg)
+
+    instances = int(args[0])
+    size = int(args[1])
+    number_op = int(args[2])
+
+    # An optional fourth argument is the name of a binary instance file
+    # (see instance_format.py) to write instead of printing text lines.
+    writer = None
+    if len(args) > 3:
+        writer = InstanceWriter(args[3])
+
+    if workers is None:
+        generated = sequential(instances, size, number_op)
+    else:
+        generated = parallel(instances, size, number_op, workers, chunk_size)
+
+    for pi, breve_pi, breve_iota in generated:
+        error = check(pi, breve_pi, size)
+        if error:
+            print(error)
             exit()
 
-    str_pi = ",".join([str(x) for x in pi])
-    str_breve_pi = ",".join([str(x) for x in breve_pi])
-    str_breve_iota = ",".join([str(x) for x in breve_iota])
+        if writer:
+            writer.write(pi, breve_pi, breve_iota)
+            continue
+
+        str_pi = ",".join([str(x) for x in pi])
+        str_breve_pi = ",".join([str(x) for x in breve_pi])
+        str_breve_iota = ",".join([str(x) for x in breve_iota])
 
-    print(str_pi, str_breve_pi, str_breve_iota)
+        print(str_pi, str_breve_pi, str_breve_iota)
 
+    if writer:
+        writer.close()
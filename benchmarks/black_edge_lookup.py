@@ -0,0 +1,84 @@
+# encoding: utf-8
+
+## Measures the cost of single operations on the cycle graph for
+## growing values of n: reversal2 over a short segment, an indel that
+## only changes the size of an intergenic region, and an insertion that
+## adds a gene. Since black edges are found by position and only the
+## changed segment has its indices updated, the time per operation of
+## the first two should stay flat. An insertion of genes adds records
+## to the positions and shifts the indices of every record in its
+## right, so its time grows linearly with n.
+##
+## Usage: python3 benchmarks/black_edge_lookup.py [operations] [sizes]
+##    operations : number of operations timed for each size (default 2000)
+##    sizes      : comma-separated list of sizes (default 100,1000,10000)
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rev_indel_intergenic import construct_str_cycle, cycle_configuration_graph, Intergenic_Rev
+
+SEGMENT = 5
+
+def random_graph(n) :
+    permutation = list(range(1, n+1))
+    random.shuffle(permutation)
+    permutation = [el if random.random() < 0.5 else -el for el in permutation]
+    wblack = [random.randint(0, 100) for _ in range(n+1)]
+    wgray  = [random.randint(0, 100) for _ in range(n+1)]
+    config, grayw, blackw = construct_str_cycle(permutation, wgray, wblack)
+    return cycle_configuration_graph(config, grayw, blackw, len(wgray))
+
+def time_reversals(graph, operations) :
+    positions = [random.randint(1, graph.n - SEGMENT - 1) for _ in range(operations)]
+    start = time.perf_counter()
+    for i in positions :
+        graph.reversal2(i, i + SEGMENT, 0, 0, [1,], [1,])
+    return (time.perf_counter() - start) / operations
+
+def time_indels(graph, operations) :
+    positions = [random.randint(1, graph.n) for _ in range(operations)]
+    start = time.perf_counter()
+    for i in positions :
+        graph.indel(1, i, 0, [], [1,])
+    return (time.perf_counter() - start) / operations
+
+## Insertions done while sorting an instance whose source has every
+## other gene of the target (the odd ones): each one adds a gene to a
+## trivial cycle. Only the calls of indel that add genes are timed.
+def time_insertions(n) :
+    permutation = list(range(1, 2*n, 2))
+    wblack = [random.randint(0, 100) for _ in range(n+1)]
+    wgray  = [random.randint(0, 100) for _ in range(2*n)]
+    config, grayw, blackw = construct_str_cycle(permutation, wgray, wblack)
+    sort = Intergenic_Rev(config, grayw, blackw, len(wgray))
+
+    indel, times = sort.graph.indel, []
+    def timed(is_insertion, i, x, elements, intergenic_regions) :
+        start = time.perf_counter()
+        unpadded = indel(is_insertion, i, x, elements, intergenic_regions)
+        if is_insertion and elements :
+            times.append(time.perf_counter() - start)
+        return unpadded
+    sort.graph.indel = timed
+    sort.sort_result(time.time(), False)
+    return sum(times) / len(times)
+
+if __name__ == '__main__':
+    random.seed(1501)
+    operations = 2000
+    sizes = [100, 1000, 10000]
+    if len(sys.argv) > 1 :
+        operations = int(sys.argv[1])
+    if len(sys.argv) > 2 :
+        sizes = [int(size) for size in sys.argv[2].split(',')]
+
+    print("%8s %16s %16s %16s" % ("n", "reversal2 (us)", "indel (us)", "insertion (us)"))
+    for n in sizes :
+        reversal  = time_reversals(random_graph(n), operations)
+        indel     = time_indels(random_graph(n), operations)
+        insertion = time_insertions(n)
+        print("%8d %16.2f %16.2f %16.2f" % (n, reversal * 1e6, indel * 1e6, insertion * 1e6))
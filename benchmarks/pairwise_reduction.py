@@ -0,0 +1,41 @@
+# encoding: utf-8
+
+## Measures the reduction of pairs of real genomes done by
+## Cyanorak/pairwise.py: every ordered pair of the extracted Cyanorak
+## genomes (.gff.in) is reduced once, with the genomes and the target
+## maps loaded beforehand, so only reduce_pair is timed.
+##
+## Usage: python3 benchmarks/pairwise_reduction.py [genomes] [directory]
+##    genomes   : number of genomes used, in name order (default: all)
+##    directory : directory with the .gff.in files (default: Cyanorak)
+
+import os
+import sys
+import time
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(root, 'Cyanorak'))
+from pairwise import read_genome, target_map, reduce_pair
+
+if __name__ == '__main__':
+    directory = os.path.join(root, 'Cyanorak')
+    limit = None
+    if len(sys.argv) > 1 :
+        limit = int(sys.argv[1])
+    if len(sys.argv) > 2 :
+        directory = sys.argv[2]
+
+    filenames = sorted(name for name in os.listdir(directory) if name.endswith('.gff.in'))
+    genomes = []
+    for name in filenames[:limit] :
+        genes, ir = read_genome(os.path.join(directory, name))
+        genomes.append((genes, ir, target_map(genes)))
+
+    start = time.perf_counter()
+    for source_genes, source_ir, _ in genomes :
+        for _, target_ir, map in genomes :
+            reduce_pair(source_genes, source_ir, target_ir, map)
+    elapsed = time.perf_counter() - start
+
+    pairs = len(genomes) * len(genomes)
+    print("%d genomes, %d pairs: %.2f s (%.2f ms per pair)" % (len(genomes), pairs, elapsed, elapsed / pairs * 1e3))
@@ -0,0 +1,275 @@
+# encoding: utf-8
+
+## Benchmark suite of the sorting algorithms. Every case is a set of
+## instances sorted by one of the algorithms (the 2.5-approximation or
+## the 3-approximation): the first instances of each file of
+## Simulated_Instances/input_{10,30,50,100} and a few pairs of Cyanorak
+## genomes, reduced by Cyanorak/pairwise.py. Each phase of the sorting
+## is timed separately for every instance:
+##    parse  : parse_instance on the text line (simulated instances only)
+##    cycles : construct_str_cycle
+##    graph  : Intergenic_Rev, i.e. the cycle graph construction
+##    sort   : Intergenic_Rev.sort
+## The report (JSON) has, for each case and phase, the percentiles of
+## the times and the instances per second, the operations per second
+## of the sorting (operations of the sequences found) and the peak of
+## memory allocated by Python while handling one instance (measured in
+## a second pass with tracemalloc, which slows the code down).
+##
+## Usage:
+##   python3 benchmarks/suite.py [options]
+##       --instances N  instances taken from each file (default 20)
+##       --pairs N      Cyanorak pairs (default 3)
+##       --variants V   comma-separated algorithms, 2.5 and/or 3
+##       --repeat R     runs of each instance, the best is kept (default 5)
+##       --no-memory    skips the memory pass
+##       --output F     writes the report into F instead of printing it
+##   python3 benchmarks/suite.py --compare OLD NEW [--threshold T]
+##       compares two reports and lists the cases and phases whose
+##       median time (or peak memory) grew by more than T (default
+##       0.10, i.e. 10%). The exit status is 1 if there is any.
+##
+## To compare two commits, run the suite on each of them (e.g. in a
+## git worktree) with the same options and compare the reports; the
+## commit of each report is recorded in it.
+
+import os
+import sys
+import json
+import time
+import getopt
+import platform
+import subprocess
+import tracemalloc
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+sys.path.insert(0, os.path.join(root, 'Cyanorak'))
+from rev_indel_intergenic import parse_instance, construct_str_cycle, Intergenic_Rev
+from pairwise import read_genome, target_map, reduce_pair
+
+DATASETS = ['input_10', 'input_30', 'input_50', 'input_100']
+PHASES = ['parse', 'cycles', 'graph', 'sort']
+PERCENTILES = [50, 90, 99]
+
+## Returns the cases: (name, list of instances), where an instance is
+## its text line, or None and its three lists if it was not read from
+## text.
+def load_cases(instances, pairs) :
+    cases = []
+    directory = os.path.join(root, 'Simulated_Instances')
+    for dataset in DATASETS :
+        path = os.path.join(directory, dataset)
+        if not os.path.isdir(path) :
+            continue
+        names = [name for name in os.listdir(path) if name.endswith('.in')]
+        for name in sorted(names, key = lambda name : int(name[:-3])) :
+            lines = []
+            with open(os.path.join(path, name)) as f :
+                for line in f :
+                    if len(lines) == instances :
+                        break
+                    if line.strip() :
+                        lines.append((line, None))
+            cases.append(("%s/%s" % (dataset, name), lines))
+
+    directory = os.path.join(root, 'Cyanorak')
+    filenames = sorted(name for name in os.listdir(directory) if name.endswith('.gff.in'))
+    genomes = {}
+    def genome(index) :
+        if index not in genomes :
+            genomes[index] = read_genome(os.path.join(directory, filenames[index]))
+        return genomes[index]
+
+    reduced = []
+    for source in range(len(filenames)) :
+        for target in range(len(filenames)) :
+            if len(reduced) == pairs :
+                break
+            if source == target :
+                continue
+            source_genes, source_ir = genome(source)
+            target_genes, target_ir = genome(target)
+            instance = reduce_pair(source_genes, source_ir, target_ir, target_map(target_genes))
+            reduced.append((None, instance))
+    if reduced :
+        cases.append(("cyanorak", reduced))
+    return cases
+
+## Sorts one instance, returning the time of each phase (None if it
+## was skipped) and the number of operations found.
+def run_instance(line, instance, is_3approx) :
+    times = {}
+    start = time.perf_counter()
+    if line is not None :
+        instance = parse_instance(line)
+        times['parse'] = time.perf_counter() - start
+    else :
+        times['parse'] = None
+    permutation, wblack, wgray = instance
+
+    start = time.perf_counter()
+    config, grayw, blackw = construct_str_cycle(permutation, wgray, wblack)
+    times['cycles'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sort = Intergenic_Rev(config, grayw, blackw, len(wgray))
+    times['graph'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = sort.sort(time.time(), is_3approx)
+    times['sort'] = time.perf_counter() - start
+    return times, int(result.split()[3])
+
+def percentile(values, p) :
+    values = sorted(values)
+    position = (len(values) - 1) * p / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+## Each instance is sorted repeat times, and the best time of each
+## phase is kept, which removes most of the noise of short runs.
+def run_case(instances, is_3approx, repeat, memory) :
+    times = dict((phase, []) for phase in PHASES)
+    operations = 0
+    for line, instance in instances :
+        best = {}
+        for _ in range(repeat) :
+            phases, length = run_instance(line, instance, is_3approx)
+            for phase in PHASES :
+                if phases[phase] is not None :
+                    best[phase] = min(best.get(phase, phases[phase]), phases[phase])
+        operations = operations + length
+        for phase in best :
+            times[phase].append(best[phase])
+
+    report = {"instances" : len(instances), "phases" : {}}
+    for phase in PHASES :
+        if not times[phase] :
+            continue
+        total = sum(times[phase])
+        report["phases"][phase] = {
+            "seconds" : total,
+            "mean" : total / len(times[phase]),
+            "percentiles" : dict(("p%d" % p, percentile(times[phase], p)) for p in PERCENTILES),
+            "instances_per_second" : len(times[phase]) / total if total > 0 else None,
+        }
+    sort_seconds = sum(times['sort'])
+    report["operations"] = operations
+    report["operations_per_second"] = operations / sort_seconds if sort_seconds > 0 else None
+
+    if memory :
+        peak = 0
+        tracemalloc.start()
+        for line, instance in instances :
+            tracemalloc.reset_peak()
+            run_instance(line, instance, is_3approx)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        report["peak_memory_bytes"] = peak
+    return report
+
+def current_commit() :
+    try :
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd = root,
+                                       stderr = subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError) :
+        return None
+
+def run_suite(instances, pairs, variants, repeat, memory) :
+    report = {
+        "commit" : current_commit(),
+        "python" : platform.python_version(),
+        "platform" : platform.platform(),
+        "date" : time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "instances" : instances,
+        "pairs" : pairs,
+        "repeat" : repeat,
+        "cases" : {},
+    }
+    for name, case in load_cases(instances, pairs) :
+        for variant in variants :
+            key = "%s:%s" % (name, variant)
+            report["cases"][key] = run_case(case, variant == "3", repeat, memory)
+            sys.stderr.write("%s %.3f s\n" % (key, report["cases"][key]["phases"]["sort"]["seconds"]))
+    return report
+
+## Returns the regressions of the new report: (case, measure, old
+## value, new value) for each median time or peak memory that grew by
+## more than the threshold. Cases missing in either report are ignored.
+def compare(old, new, threshold) :
+    regressions = []
+    for key in sorted(set(old["cases"]) & set(new["cases"])) :
+        old_case, new_case = old["cases"][key], new["cases"][key]
+        measures = []
+        for phase in PHASES :
+            if phase in old_case["phases"] and phase in new_case["phases"] :
+                measures.append((phase + " p50",
+                                 old_case["phases"][phase]["percentiles"]["p50"],
+                                 new_case["phases"][phase]["percentiles"]["p50"]))
+        if "peak_memory_bytes" in old_case and "peak_memory_bytes" in new_case :
+            measures.append(("peak memory", old_case["peak_memory_bytes"], new_case["peak_memory_bytes"]))
+        for measure, before, after in measures :
+            if before > 0 and after > before * (1 + threshold) :
+                regressions.append((key, measure, before, after))
+    return regressions
+
+if __name__ == '__main__':
+    try :
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "", ["instances=", "pairs=", "variants=",
+                                                          "repeat=", "no-memory", "output=", "compare",
+                                                          "threshold="])
+    except getopt.GetoptError as err :
+        print(err)
+        sys.exit(2)
+
+    instances, pairs, variants, repeat, memory, output = 20, 3, ["2.5", "3"], 5, True, None
+    comparing, threshold = False, 0.10
+    for opt, arg in opts :
+        if opt == "--instances" :
+            instances = int(arg)
+        if opt == "--pairs" :
+            pairs = int(arg)
+        if opt == "--variants" :
+            variants = arg.split(",")
+        if opt == "--repeat" :
+            repeat = int(arg)
+        if opt == "--no-memory" :
+            memory = False
+        if opt == "--output" :
+            output = arg
+        if opt == "--compare" :
+            comparing = True
+        if opt == "--threshold" :
+            threshold = float(arg)
+
+    if comparing :
+        if len(args) != 2 :
+            print("Usage: python3 benchmarks/suite.py --compare OLD NEW [--threshold T]")
+            sys.exit(2)
+        with open(args[0]) as f :
+            old = json.load(f)
+        with open(args[1]) as f :
+            new = json.load(f)
+        regressions = compare(old, new, threshold)
+        print("%s -> %s" % (old.get("commit"), new.get("commit")))
+        for key, measure, before, after in regressions :
+            print("REGRESSION %-24s %-14s %12.6g -> %12.6g (%+.1f%%)" %
+                  (key, measure, before, after, (after / before - 1) * 100))
+        if not regressions :
+            print("No regressions above %.0f%%" % (threshold * 100))
+        sys.exit(1 if regressions else 0)
+
+    for variant in variants :
+        if variant not in ("2.5", "3") :
+            print("Unknown variant %s (use 2.5 or 3)" % variant)
+            sys.exit(2)
+
+    report = run_suite(instances, pairs, variants, repeat, memory)
+    text = json.dumps(report, indent = 2, sort_keys = True)
+    if output is None :
+        print(text)
+    else :
+        with open(output, 'w') as f :
+            f.write(text + "\n")
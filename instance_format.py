@@ -0,0 +1,155 @@
+# encoding: utf-8
+
+## Binary container for instances of the sorting problem, used as a
+## faster alternative to the text files of Simulated_Instances (one
+## instance per line, with three comma-separated lists).
+##
+## Layout (all fields are little-endian int32):
+##     header   : magic "RIIB", version, number of instances
+##     instance : len(pi), pi, len(breve_pi), breve_pi,
+##                len(breve_iota), breve_iota
+##
+## The lists are the same given to rev_indel_intergenic.py: the
+## permutation, the intergenic sizes of the input genome and the
+## intergenic sizes of the target genome.
+##
+## Usage: python3 instance_format.py [--to-text] INPUT OUTPUT
+##     converts the text file INPUT (.in) into the binary file OUTPUT,
+##     or the other way around with --to-text.
+
+import sys
+import mmap
+import array
+import struct
+import getopt
+
+MAGIC   = b'RIIB'
+VERSION = 1
+
+HEADER = struct.Struct('<4sii')
+LENGTH = struct.Struct('<i')
+
+## Checks whether a file starts with the magic number of the format.
+def is_binary(filename) :
+    if filename == "-" :
+        return False
+    with open(filename, 'rb') as f :
+        return f.read(len(MAGIC)) == MAGIC
+
+## Writes instances one at a time. The number of instances in the
+## header is only known when the writer is closed, so the output must
+## be a regular file.
+class InstanceWriter :
+    def __init__(self, filename) :
+        self.count = 0
+        self.__file = open(filename, 'wb')
+        self.__file.write(HEADER.pack(MAGIC, VERSION, 0))
+
+    def write(self, pi, breve_pi, breve_iota) :
+        for values in (pi, breve_pi, breve_iota) :
+            data = array.array('i', values)
+            if sys.byteorder == 'big' :
+                data.byteswap()
+            self.__file.write(LENGTH.pack(len(data)))
+            self.__file.write(data.tobytes())
+        self.count = self.count + 1
+
+    def close(self) :
+        self.__file.seek(0)
+        self.__file.write(HEADER.pack(MAGIC, VERSION, self.count))
+        self.__file.close()
+
+    def __enter__(self) :
+        return self
+
+    def __exit__(self, *exc) :
+        self.close()
+
+def write_instances(filename, instances) :
+    with InstanceWriter(filename) as writer :
+        for pi, breve_pi, breve_iota in instances :
+            writer.write(pi, breve_pi, breve_iota)
+        return writer.count
+
+## Returns the number of instances of a binary file, reading only its
+## header.
+def count_instances(filename) :
+    with open(filename, 'rb') as f :
+        magic, version, count = HEADER.unpack(f.read(HEADER.size))
+    _check_header(filename, magic, version)
+    return count
+
+def _check_header(filename, magic, version) :
+    if magic != MAGIC :
+        raise ValueError("%s is not a binary instance file" % filename)
+    if version != VERSION :
+        raise ValueError("%s has unsupported version %d" % (filename, version))
+
+## Iterates over the instances of a binary file. The file is memory
+## mapped and each instance is returned as three memoryviews of int32
+## over the mapping, so nothing is copied until the caller asks for
+## it (e.g. with tolist()). The views must not be kept after the
+## iteration finishes, since the mapping is closed then.
+def iter_instances(filename) :
+    with open(filename, 'rb') as f :
+        if f.seek(0, 2) == 0 :
+            raise ValueError("%s is empty" % filename)
+        data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+
+    view = memoryview(data)
+    try :
+        magic, version, count = HEADER.unpack_from(view, 0)
+        _check_header(filename, magic, version)
+
+        ## Aligned to 4 bytes, since the header and every field have
+        ## this size.
+        values = view[HEADER.size:].cast('i')
+        if sys.byteorder == 'big' :
+            values = array.array('i', values)
+            values.byteswap()
+            values = memoryview(values)
+
+        position = 0
+        for _ in range(count) :
+            instance = []
+            for _ in range(3) :
+                length = values[position]
+                instance.append(values[position+1:position+1+length])
+                position = position + 1 + length
+            yield tuple(instance)
+    finally :
+        ## The mapping stays open while the caller keeps views of it.
+        view.release()
+        try :
+            data.close()
+        except BufferError :
+            pass
+
+## Reads the instances of a text file with the parser of
+## rev_indel_intergenic.py. It is imported here rather than at the top,
+## since rev_indel_intergenic.py imports this module.
+def _read_text(filename) :
+    from rev_indel_intergenic import parse_instance
+    with open(filename, 'r') as f :
+        for line in f :
+            if line.strip() :
+                yield parse_instance(line)
+
+if __name__ == '__main__':
+    try :
+        opts, args = getopt.getopt(sys.argv[1:], "", ["to-text"])
+    except getopt.GetoptError as err :
+        print(err)
+        sys.exit(2)
+    if len(args) != 2 :
+        print("Usage: python3 instance_format.py [--to-text] INPUT OUTPUT")
+        sys.exit(2)
+
+    source, target = args
+    if ("--to-text", "") in opts :
+        with open(target, 'w') as out :
+            for instance in iter_instances(source) :
+                out.write(" ".join(",".join(map(str, values.tolist()))
+                                   for values in instance) + "\n")
+    else :
+        write_instances(target, _read_text(source))
@@ -0,0 +1,108 @@
+# encoding: utf-8
+
+## Optional profiling of Intergenic_Rev (rev_indel_intergenic.py). A
+## Profile attached to a sorter replaces, on that object and on its
+## cycle graph only, the methods below by wrappers that count the
+## calls and measure their time:
+##    lemmas     : lemma_5 to lemma_11, with the number of calls that
+##                 found an operation (hits), and the number of cycles
+##                 and vertices they took from get_cycles_of_class
+##    steps      : the searches used by the lemmas, with their hits
+##    primitives : the operations of the cycle graph
+## The classes themselves are not changed, so sorters without a
+## profile run exactly the same code as before. Times include the
+## nested calls (e.g. lemma_9 includes search_crossing_edges, and most
+## methods include calculate_cycles).
+
+import time
+
+LEMMAS = ["lemma_5", "lemma_6", "lemma_7", "lemma_8", "lemma_9", "lemma_10", "lemma_11"]
+STEPS = ["search_rev_indel", "find_first_triple", "is_oriented",
+         "_Intergenic_Rev__search_crossing_edges", "_Intergenic_Rev__indel_get_balance"]
+PRIMITIVES = ["reversal2", "indel", "calculate_cycles", "get_cycles", "reset_indices"]
+
+## Fields of a record
+CALLS, HITS, SECONDS, CYCLES, VERTICES = range(5)
+
+## Name shown for a method (without the prefix of private methods)
+def display_name(name) :
+    return name.replace("_Intergenic_Rev__", "")
+
+class Profile :
+    def __init__(self) :
+        ## Records by name: [calls, hits, seconds, cycles, vertices].
+        ## It only holds numbers, so it can be sent between processes.
+        self.records = {}
+        ## Record of the lemma running, which the cycles scanned are
+        ## counted for
+        self.__lemma = None
+
+    def record(self, name) :
+        if name not in self.records :
+            self.records[name] = [0, 0, 0.0, 0, 0]
+        return self.records[name]
+
+    def __timed(self, name, method, is_lemma = False) :
+        record = self.record(name)
+        def timed(*args, **kwargs) :
+            if is_lemma :
+                previous, self.__lemma = self.__lemma, record
+            start = time.perf_counter()
+            try :
+                result = method(*args, **kwargs)
+            finally :
+                record[SECONDS] += time.perf_counter() - start
+                record[CALLS] += 1
+                if is_lemma :
+                    self.__lemma = previous
+            if result :
+                record[HITS] += 1
+            return result
+        return timed
+
+    def __scanned(self, method) :
+        def scanned(cycle_class) :
+            for cycle in method(cycle_class) :
+                if self.__lemma is not None :
+                    self.__lemma[CYCLES] += 1
+                    self.__lemma[VERTICES] += len(cycle)
+                yield cycle
+        return scanned
+
+    ## Instruments a sorter (an Intergenic_Rev) and its cycle graph.
+    def attach(self, sort) :
+        for name in LEMMAS + STEPS :
+            setattr(sort, name, self.__timed(display_name(name), getattr(sort, name), name in LEMMAS))
+        graph = sort.graph
+        for name in PRIMITIVES :
+            setattr(graph, name, self.__timed(name, getattr(graph, name)))
+        graph.get_cycles_of_class = self.__scanned(graph.get_cycles_of_class)
+
+    ## Adds the records of another profile (or its records).
+    def merge(self, records) :
+        if isinstance(records, Profile) :
+            records = records.records
+        for name, values in records.items() :
+            record = self.record(name)
+            for field in range(len(record)) :
+                record[field] += values[field]
+
+    ## Returns a table with one line per method called.
+    def summary(self) :
+        lines = ["%-24s %10s %10s %12s %10s %12s" % ("method", "calls", "hits", "seconds", "cycles", "vertices")]
+        groups = [(LEMMAS, True), (STEPS, True), (PRIMITIVES, False)]
+        for names, has_hits in groups :
+            for name in names :
+                name = display_name(name)
+                if name not in self.records :
+                    continue
+                calls, hits, seconds, cycles, vertices = self.records[name]
+                if not calls :
+                    continue
+                if name in LEMMAS :
+                    lines.append("%-24s %10d %10d %12.6f %10d %12d" % (name, calls, hits, seconds, cycles, vertices))
+                elif has_hits :
+                    lines.append("%-24s %10d %10d %12.6f %10s %12s" % (name, calls, hits, seconds, "-", "-"))
+                else :
+                    lines.append("%-24s %10d %10s %12.6f %10s %12s" % (name, calls, "-", seconds, "-", "-"))
+        return "\n".join(lines)
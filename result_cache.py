@@ -0,0 +1,166 @@
+# encoding: utf-8
+
+## On-disk cache of sorting results, shared by the drivers that call
+## rev_indel_intergenic.sort_instance (--batch and
+## Cyanorak/pipeline.py) when they are given a cache file. The same
+## reduced instances recur across runs (both algorithms, reruns after
+## a crash, regenerated datasets), and the sorting is deterministic,
+## so a result can be reused whenever the instance, the algorithm and
+## the version of the sorting code are the same.
+##
+## Results are kept in a SQLite database, keyed by a hash of the
+## instance, the algorithm and the version, with the length of the
+## sequence, the sequence itself (as written in the result line), the
+## approximation ratio, the time spent sorting the instance and the
+## error mark of the result line, if any. Results sorted without
+## keeping the sequence have no sequence (NULL), and only answer
+## requests that do not need it. When the stored sequences exceed the
+## size limit, the least recently used results are evicted. Several
+## processes may use the same file.
+##
+## Lookups only read the database. The new results and the results
+## found are kept in memory until flush is called, which writes them
+## (and their last use) in a single transaction: the drivers flush
+## once per chunk of instances.
+
+import os
+import time
+import sqlite3
+import hashlib
+
+## Default size limit (in bytes)
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+
+## Bytes counted for each result besides its sequence
+ENTRY_OVERHEAD = 64
+
+## Layout of the database. Files of another layout are emptied.
+SCHEMA = 2
+
+## Keys looked up by a query when flushing (below the limit of SQLite
+## on the number of parameters)
+LOOKUP_SIZE = 500
+
+## Returns the key of an instance sorted by the given algorithm and
+## version of the sorting code.
+def instance_key(permutation, wblack, wgray, is_3approx, version) :
+    text = "%s|%s|%s|%s|%s" % (list(permutation), list(wblack), list(wgray),
+                               "3" if is_3approx else "2.5", version)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+class ResultCache :
+    def __init__(self, filename, max_size = DEFAULT_MAX_SIZE) :
+        directory = os.path.dirname(filename)
+        if directory and not os.path.isdir(directory) :
+            os.makedirs(directory, exist_ok = True)
+        self.max_size = max_size
+        ## Results to write (key, length, sequence, ratio, seconds,
+        ## error) and keys of the results found, see flush
+        self.__pending = []
+        self.__used    = set()
+        ## Transactions are started explicitly (BEGIN IMMEDIATE), so
+        ## that the total size is updated atomically when several
+        ## processes write into the file. The cache is only a copy of
+        ## results that can be sorted again, so the last transactions
+        ## may be lost on a power failure (synchronous=NORMAL), which
+        ## saves a sync of the file per transaction.
+        self.__db = sqlite3.connect(filename, timeout = 60, isolation_level = None)
+        self.__db.execute("PRAGMA journal_mode=WAL")
+        self.__db.execute("PRAGMA synchronous=NORMAL")
+        with self.__db :
+            self.__db.execute("BEGIN IMMEDIATE")
+            if self.__db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA :
+                self.__db.execute("DROP TABLE IF EXISTS results")
+                self.__db.execute("DROP TABLE IF EXISTS meta")
+                self.__db.execute("PRAGMA user_version = %d" % SCHEMA)
+            self.__db.execute("""CREATE TABLE IF NOT EXISTS results (
+                                     key      TEXT PRIMARY KEY,
+                                     length   INTEGER,
+                                     sequence TEXT,
+                                     ratio    REAL,
+                                     seconds  REAL,
+                                     error    TEXT,
+                                     size     INTEGER,
+                                     used     REAL)""")
+            self.__db.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+            ## Total size of the results, kept up to date by every
+            ## process that writes into the file
+            self.__db.execute("CREATE TABLE IF NOT EXISTS meta (total INTEGER)")
+            if self.__db.execute("SELECT COUNT(*) FROM meta").fetchone()[0] == 0 :
+                self.__db.execute("INSERT INTO meta VALUES (0)")
+
+    ## Returns (length, sequence, ratio, seconds, error) of the key, or
+    ## None. The sequence is None if the result was stored without
+    ## it, and seconds is the time spent sorting the instance when it
+    ## was stored.
+    def get(self, key) :
+        row = self.__db.execute("SELECT length, sequence, ratio, seconds, error FROM results WHERE key = ?",
+                                (key,)).fetchone()
+        if row is not None :
+            self.__used.add(key)
+        return row
+
+    ## Stores a result when flush is called.
+    def put(self, key, length, sequence, ratio, seconds, error = "") :
+        self.__pending.append((key, length, sequence, ratio, seconds, error))
+
+    ## Writes the results stored since the last call and the last use
+    ## of the results found, in one transaction.
+    def flush(self) :
+        if not self.__pending and not self.__used :
+            return
+        now = time.time()
+        rows = dict((entry[0], entry[1:] + (len(entry[2] or "") + ENTRY_OVERHEAD, now))
+                    for entry in self.__pending)
+        with self.__db :
+            self.__db.execute("BEGIN IMMEDIATE")
+            ## Results replaced (e.g. stored by another process in the
+            ## meantime) are not counted twice in the total size
+            change = sum(row[5] for row in rows.values())
+            keys = list(rows)
+            for start in range(0, len(keys), LOOKUP_SIZE) :
+                part = keys[start:start+LOOKUP_SIZE]
+                query = "SELECT SUM(size) FROM results WHERE key IN (%s)" % ",".join("?" * len(part))
+                change = change - (self.__db.execute(query, part).fetchone()[0] or 0)
+            self.__db.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                  [(key,) + row for key, row in rows.items()])
+            self.__db.executemany("UPDATE results SET used = ? WHERE key = ?",
+                                  [(now, key) for key in self.__used])
+            self.__db.execute("UPDATE meta SET total = total + ?", (change,))
+            self.__evict()
+        self.__pending = []
+        self.__used    = set()
+
+    ## Removes the least recently used results until the total size is
+    ## within the limit.
+    def __evict(self) :
+        excess = self.total_size() - self.max_size
+        if excess <= 0 :
+            return
+        keys, freed = [], 0
+        for key, size in self.__db.execute("SELECT key, size FROM results ORDER BY used") :
+            keys.append((key,))
+            freed = freed + size
+            if freed >= excess :
+                break
+        self.__db.executemany("DELETE FROM results WHERE key = ?", keys)
+        self.__db.execute("UPDATE meta SET total = total - ?", (freed,))
+
+    def total_size(self) :
+        return self.__db.execute("SELECT total FROM meta").fetchone()[0]
+
+    def __len__(self) :
+        return self.__db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self) :
+        self.flush()
+        self.__db.close()
+
+## Caches opened by this process, by filename. Each process of a pool
+## opens its own connection the first time it needs one.
+_opened = {}
+
+def open_cache(filename, max_size = DEFAULT_MAX_SIZE) :
+    if filename not in _opened :
+        _opened[filename] = ResultCache(filename, max_size)
+    return _opened[filename]
@@ -0,0 +1,332 @@
+# encoding: utf-8
+
+## Results of the sorting (rev_indel_intergenic.py) as objects, and
+## the writers and readers of their output formats:
+##     text   : the result line printed by rev_indel_intergenic.py,
+##              i.e. the input, the distance, the sequence of
+##              operations, the approximation ratio, the time and the
+##              error mark, if any
+##     jsonl  : one JSON object per result ("cached" is true for the
+##              results taken from the cache)
+##     binary : records with the fields of the results and their
+##              operations as int32 values (layout below)
+## The sequence of operations may be left out of every format, since
+## it is by far the largest part of the result for large genomes. In
+## the text format it is then written as "-".
+##
+## Binary layout (little-endian):
+##     header    : magic "RIIR", version (int32)
+##     result    : distance (int32), lower bound (int32), ratio
+##                 (float64), seconds (float64), status (uint8),
+##                 number of operations (int32, -1 if left out)
+##     operation : kind (uint8, the index in KINDS), then for a
+##                 reversal i, j, x, y (int32), and for an indel
+##                 i, x (int32), the length and the values of the
+##                 elements, and the length and the values of the
+##                 intergenic sizes (int32)
+## The records are not counted in the header, so a binary file can be
+## written to a pipe and is read until its end.
+##
+## Usage: python3 result_format.py [--format F] [--no-sequence] INPUT OUTPUT
+##     converts a result file of any format (text, jsonl or binary)
+##     into the format F (default jsonl).
+
+import sys
+import ast
+import json
+import struct
+import getopt
+
+MAGIC   = b'RIIR'
+VERSION = 1
+
+HEADER    = struct.Struct('<4si')
+RECORD    = struct.Struct('<iiddBi')
+KIND      = struct.Struct('<B')
+REVERSAL  = struct.Struct('<iiii')
+INDEL     = struct.Struct('<ii')
+LENGTH    = struct.Struct('<i')
+
+FORMATS = ["text", "jsonl", "binary"]
+
+## Operations, as the first field of their tuples
+KINDS = ["DEL", "INS", "REV"]
+
+## Status of a result: the sequence found is valid, or the error mark
+## written after the text line
+OK                 = "OK"
+NOT_SORTED         = "ERROR-NOT-SORTED"
+LOWER_BOUND_HIGHER = "ERROR-LOWER-BOUND-HIGHER"
+STATUSES = [OK, NOT_SORTED, LOWER_BOUND_HIGHER]
+
+## Returns the result line of a sorted instance. The error mark is
+## appended when the sequence found is not valid.
+def format_line(input_cycles, input_wgray, input_wblack, length, sequence, ratio, seconds, error = "") :
+    line = '%s [%s] [%s] %d %s %f %f' % (input_cycles,
+                                         input_wgray,
+                                         input_wblack,
+                                         length,
+                                         sequence,
+                                         ratio,
+                                         seconds)
+    if error :
+        line = line + " " + error
+    return line
+
+class SortResult :
+    ## input is the triple of strings that starts the text line (the
+    ## cycle configuration and the intergenic sizes, see
+    ## rev_indel_intergenic.format_input). operations is the list of
+    ## operation tuples, or None if they were not kept. Results read
+    ## from a text line or from the cache have the sequence as text
+    ## (sequence_text) and their operations are parsed when needed.
+    ## counts is the number of operations of each kind, given by the
+    ## sorting even when the operations are not kept. cached tells
+    ## that the result was taken from the cache (see result_cache.py),
+    ## seconds is then the time of the sorting that stored it.
+    def __init__(self, distance, lower_bound, ratio, seconds, status = OK, operations = None,
+                 input = None, sequence_text = None, counts = None, cached = False) :
+        self.distance      = distance
+        self.lower_bound   = lower_bound
+        self.ratio         = ratio
+        self.seconds       = seconds
+        self.status        = status
+        self.input         = input
+        self.counts        = counts
+        self.cached        = cached
+        self.__operations  = operations
+        self.__text        = sequence_text
+
+    def has_sequence(self) :
+        return self.__operations is not None or self.__text is not None
+
+    @property
+    def operations(self) :
+        if self.__operations is None and self.__text is not None :
+            self.__operations = [tuple(op) for op in ast.literal_eval(self.__text)]
+        return self.__operations
+
+    ## The sequence as written in the text line, or None
+    def sequence_text(self) :
+        if self.__text is None and self.__operations is not None :
+            self.__text = str(self.__operations).replace(" ", "")
+        return self.__text
+
+    ## Error mark of the text line ("" if the result is valid)
+    def error(self) :
+        return "" if self.status == OK else self.status
+
+    ## Number of operations of the given kind ("REV", "INS" or "DEL"),
+    ## or None if neither the counts nor the operations are known
+    def count(self, kind) :
+        if self.counts is not None :
+            return self.counts[kind]
+        if not self.has_sequence() :
+            return None
+        if self.__operations is None :
+            return self.__text.count("('%s'" % kind)
+        return sum(1 for op in self.operations if op[0] == kind)
+
+    ## The text line. Results without input (read from the other
+    ## formats, or sorted with distance_only) have it written as "-".
+    def line(self, with_sequence = True) :
+        sequence = self.sequence_text() if with_sequence else None
+        input = self.input if self.input is not None else ("-", "-", "-")
+        return format_line(input[0], input[1], input[2], self.distance,
+                           "-" if sequence is None else sequence, self.ratio, self.seconds,
+                           self.error())
+
+    def to_dict(self, with_sequence = True, with_input = False) :
+        record = {"distance" : self.distance,
+                  "lower_bound" : self.lower_bound,
+                  "ratio" : self.ratio,
+                  "seconds" : self.seconds,
+                  "status" : self.status}
+        if self.cached :
+            record["cached"] = True
+        if with_input and self.input is not None :
+            record["input"] = list(self.input)
+        if self.counts is not None or self.has_sequence() :
+            record["counts"] = dict((kind, self.count(kind)) for kind in KINDS)
+        if with_sequence and self.has_sequence() :
+            record["operations"] = self.operations
+        return record
+
+    def to_json(self, with_sequence = True, with_input = False) :
+        return json.dumps(self.to_dict(with_sequence, with_input), separators = (",", ":"))
+
+    @classmethod
+    def from_dict(cls, record) :
+        operations = record.get("operations")
+        if operations is not None :
+            operations = [tuple(op) for op in operations]
+        input = record.get("input")
+        return cls(record["distance"], record["lower_bound"], record["ratio"], record["seconds"],
+                   record["status"], operations, tuple(input) if input else None,
+                   counts = record.get("counts"), cached = record.get("cached", False))
+
+    ## Parses a result line of the text format. The lower bound is not
+    ## written there, it is recovered from the distance and the ratio.
+    @classmethod
+    def from_line(cls, line) :
+        fields = line.split()
+        distance, ratio = int(fields[3]), float(fields[5])
+        status = " ".join(fields[7:]) or OK
+        return cls(distance, lower_bound(distance, ratio), ratio, float(fields[6]), status,
+                   input = (fields[0], fields[1][1:-1], fields[2][1:-1]),
+                   sequence_text = None if fields[4] == "-" else fields[4])
+
+## Lower bound of a result given its distance and approximation ratio
+## (the ratio of an instance already sorted is 1 with distance 0)
+def lower_bound(distance, ratio) :
+    if distance == 0 or ratio == 0 :
+        return 0
+    return int(round(distance / ratio))
+
+class TextWriter :
+    def __init__(self, f, with_sequence = True) :
+        self.__file = f
+        self.with_sequence = with_sequence
+
+    def write(self, result) :
+        self.__file.write(result.line(self.with_sequence) + "\n")
+
+    def close(self) :
+        if self.__file is not sys.stdout :
+            self.__file.close()
+
+class JsonWriter :
+    def __init__(self, f, with_sequence = True) :
+        self.__file = f
+        self.with_sequence = with_sequence
+
+    def write(self, result) :
+        self.__file.write(result.to_json(self.with_sequence) + "\n")
+
+    def close(self) :
+        if self.__file is not sys.stdout :
+            self.__file.close()
+
+## Writes into a binary file (or stream), whose values must be
+## integers: the float values found in some sequences (e.g. 36.0) are
+## written as int32.
+class BinaryWriter :
+    def __init__(self, f, with_sequence = True) :
+        self.__file = f
+        self.with_sequence = with_sequence
+        self.__file.write(HEADER.pack(MAGIC, VERSION))
+
+    def write(self, result) :
+        operations = result.operations if self.with_sequence else None
+        parts = [RECORD.pack(result.distance, result.lower_bound, result.ratio, result.seconds,
+                             STATUSES.index(result.status),
+                             -1 if operations is None else len(operations))]
+        for op in operations or [] :
+            parts.append(KIND.pack(KINDS.index(op[0])))
+            if op[0] == "REV" :
+                parts.append(REVERSAL.pack(*[_integer(value) for value in op[1:5]]))
+            else :
+                parts.append(INDEL.pack(_integer(op[1]), _integer(op[2])))
+                for values in (op[3], op[4]) :
+                    parts.append(LENGTH.pack(len(values)))
+                    parts.append(struct.pack('<%di' % len(values), *[_integer(value) for value in values]))
+        self.__file.write(b"".join(parts))
+
+    def close(self) :
+        if self.__file is not sys.stdout.buffer :
+            self.__file.close()
+
+def _integer(value) :
+    integer = int(value)
+    if integer != value :
+        raise ValueError("%r cannot be written in a binary result file" % value)
+    return integer
+
+## Opens a writer of the given format into filename, or stdout if
+## filename is None.
+def open_writer(output_format, filename = None, with_sequence = True) :
+    if output_format not in FORMATS :
+        raise ValueError("Unknown result format %s (use %s)" % (output_format, ", ".join(FORMATS)))
+    if output_format == "binary" :
+        f = sys.stdout.buffer if filename is None else open(filename, 'wb')
+        return BinaryWriter(f, with_sequence)
+    f = sys.stdout if filename is None else open(filename, 'w')
+    if output_format == "jsonl" :
+        return JsonWriter(f, with_sequence)
+    return TextWriter(f, with_sequence)
+
+## Iterates over the results of a binary file.
+def iter_binary(filename) :
+    with open(filename, 'rb') as f :
+        data = f.read()
+    magic, version = HEADER.unpack_from(data, 0)
+    if magic != MAGIC :
+        raise ValueError("%s is not a binary result file" % filename)
+    if version != VERSION :
+        raise ValueError("%s has unsupported version %d" % (filename, version))
+
+    position = HEADER.size
+    while position < len(data) :
+        distance, bound, ratio, seconds, status, count = RECORD.unpack_from(data, position)
+        position = position + RECORD.size
+        operations = None
+        if count >= 0 :
+            operations = []
+            for _ in range(count) :
+                kind = KINDS[KIND.unpack_from(data, position)[0]]
+                position = position + KIND.size
+                if kind == "REV" :
+                    operations.append((kind,) + REVERSAL.unpack_from(data, position))
+                    position = position + REVERSAL.size
+                    continue
+                i, x = INDEL.unpack_from(data, position)
+                position = position + INDEL.size
+                lists = []
+                for _ in range(2) :
+                    length = LENGTH.unpack_from(data, position)[0]
+                    position = position + LENGTH.size
+                    lists.append(list(struct.unpack_from('<%di' % length, data, position)))
+                    position = position + 4 * length
+                operations.append((kind, i, x, lists[0], lists[1]))
+        yield SortResult(distance, bound, ratio, seconds, STATUSES[status], operations)
+
+## Iterates over the results of a file of any format.
+def read_results(filename) :
+    with open(filename, 'rb') as f :
+        binary = f.read(len(MAGIC)) == MAGIC
+    if binary :
+        for result in iter_binary(filename) :
+            yield result
+        return
+
+    with open(filename, 'r') as f :
+        for line in f :
+            line = line.strip()
+            if not line :
+                continue
+            if line.startswith("{") :
+                yield SortResult.from_dict(json.loads(line))
+            else :
+                yield SortResult.from_line(line)
+
+if __name__ == '__main__':
+    try :
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "", ["format=", "no-sequence"])
+    except getopt.GetoptError as err :
+        print(err)
+        sys.exit(2)
+    if len(args) != 2 :
+        print("Usage: python3 result_format.py [--format F] [--no-sequence] INPUT OUTPUT")
+        sys.exit(2)
+
+    output_format, with_sequence = "jsonl", True
+    for opt, arg in opts :
+        if opt == "--format" :
+            output_format = arg
+        if opt == "--no-sequence" :
+            with_sequence = False
+
+    writer = open_writer(output_format, args[1], with_sequence)
+    for result in read_results(args[0]) :
+        writer.write(result)
+    writer.close()
@@ -4,18 +4,60 @@ import math
 import sys
 import random
 import itertools
+import bisect
 import time
+import getopt
+import os
+import multiprocessing
+import zlib
+import json
+import hashlib
+
+import instance_format
+import result_cache
+import result_format
+import profiling
 
 
 DEBUG = False
 
+## Version of the sorting code, which is all in this file: a digest of
+## the file. It is part of the keys of the result cache, so results
+## sorted by other versions of the code are never reused.
+def solver_version() :
+    with open(os.path.abspath(__file__), 'rb') as f :
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+SOLVER_VERSION = solver_version()
+
+## Classes of cycles kept by cycle_configuration_graph, each one has
+## the cycles that one of the lemmas of Intergenic_Rev looks for.
+TRIVIAL_UNBALANCED    = 0 ## lemma 5: trivial, not black-labeled and
+                          ## clean unbalanced or gray-labeled non-negative
+TRIVIAL_BLACK_LABELED = 1 ## lemma 6: trivial, black-labeled or negative
+DIVERGENT_LABELED     = 2 ## lemma 7: divergent and labeled
+DIVERGENT_CLEAN       = 3 ## lemma 8: divergent and clean
+NON_TRIVIAL           = 4 ## lemmas 9 and 11
+ORIENTED              = 5 ## lemmas 9 and 10: more than two black edges,
+                          ## oriented (see Intergenic_Rev.is_oriented)
+NON_ORIENTED          = 6 ## more than two black edges, not oriented
+NUM_CYCLE_CLASSES     = 7
+
 
 #####################################################################
 ################## REPRESENTS A NODE OF A GRAPH #####################
 #####################################################################
 
+## A graph has 2n nodes, so the attributes are declared in __slots__:
+## nodes have no __dict__, which saves memory on genomes with
+## thousands of genes and makes the attribute accesses faster.
 class cycle_graph_node :
 
+    __slots__ = ('index', 'value', 'padded', 'cycle', 'kind', 'size',
+                 'blacks', 'grays', 'gray_labeled', 'black_labeled',
+                 'direction', 'ap', 'ab', 'ac', 'visit',
+                 'wc', 'wp', 'wcs', 'wps', 'lc', 'lc_iota', 'lp')
+
     def __init__(self, index, padded) :
         #index  : stores the black edge i, 0 <= i <= n+1
         #value  : stores pi_i
@@ -101,6 +143,23 @@ class cycle_configuration_graph() :
         ## The number of cycles was never calculated
         self.__num_cycles           = False
         self.__num_odd_cycles       = False
+
+        ## Cycle bookkeeping, see calculate_cycles. Each cycle has an
+        ## identifier (stored in node.cycle of its vertices) mapped to
+        ## [vertices, elements, index of vertices[0] when elements was
+        ## computed, classes, sorted odd indices (see
+        ## get_odd_indices)]. Its vertices start at the one with the
+        ## largest odd index, and the identifiers are kept in
+        ## decreasing order of that index, which is the order in which
+        ## a walk from end_node finds the cycles. The identifiers of
+        ## each class of cycles are kept in the same order.
+        self.__cycles         = {}
+        self.__cycle_order    = []
+        self.__cycle_classes  = [[] for _ in range(NUM_CYCLE_CLASSES)]
+        self.__next_cycle     = 1      # node.cycle = 0 means unset
+        self.__cycles_view    = None   # result of get_cycles
+        self.__dirty_nodes    = []     # records changed since last update
+        self.__all_dirty      = True   # every cycle must be traced
         self.__first_indice_shift   = 0 # Tell us the index of the
                                         # edge that is pointed by
                                         # begin_node. If it is
@@ -121,6 +180,11 @@ class cycle_configuration_graph() :
         self.begin_node = node_list[0 ]
         self.end_node   = node_list[-1]
 
+        ## Record stored in each position (i.e. the inverse of
+        ## node.index). It is kept updated by the operations, so
+        ## black edges are found without walking through the graph.
+        self.__nodes = node_list
+
         # Creating ap
         for i in range(0,2*n,2) :
             node_list[i  ].ap  = node_list[i+1]
@@ -207,33 +271,11 @@ class cycle_configuration_graph() :
     ############################################################ 
     # transposition when model has no indels
     def transposition(self, i, j, k, weight_i, weight_j, weight_k) :
-        node_i = None
-        node_j = None
-        node_k = None
-
-        unp_i, unp_j, unp_k = 0,0,0
-
-        count     = 0
-        unp_count = 0
-
-        node = self.begin_node
         # Find the black edges
-        while node :
-            count = count + 1
-            if not node.padded :
-                unp_count = unp_count + 1
-
-            if count == i :
-                node_i = node
-                unp_i  = unp_count
-            if count == j :
-                node_j = node
-                unp_j  = unp_count
-            if count == k :
-                node_k = node
-                unp_k  = unp_count
-            node = node.ap.ab
-        
+        node_i, unp_i = self.black_edge(i)
+        node_j, unp_j = self.black_edge(j)
+        node_k, unp_k = self.black_edge(k)
+
         if (weight_i <  0 or weight_i > node_i.wp) :
             print("ERRO: Peso inconsistente no lado esquerdo: i (max = %s: w = %s)" % (
                 node_i.wp,
@@ -282,36 +324,18 @@ class cycle_configuration_graph() :
         
         self.__num_cycles           = False
         self.__num_odd_cycles       = False
-        self.reset_indices()
+        self.reset_indices(node_i.index)
         return unp_i, unp_j, unp_k
     
     # reversal when model has no indels
     def reversal(self, i, j, weight) :
-        node_i = None
-        node_j = None
-
-        unp_i, unp_j = 0,0
-
-        count     = 0
-        unp_count = 0
         ## These variables are used to return the transposition
         ## applied as integer. ret_i, and ret_j will be the same
         ## as i,j if we do not have ignored black edges
-        node = self.begin_node
         # Find the black edges
-
-        while node :
-            count = count + 1
-            if not node.padded :
-                unp_count = unp_count + 1
-
-            if count == i :
-                node_i = node
-                unp_i  = unp_count
-            if count == j+1 :
-                node_j = node
-                unp_j  = unp_count - 1
-            node = node.ap.ab
+        node_i, unp_i = self.black_edge(i)
+        node_j, unp_j = self.black_edge(j+1)
+        unp_j = unp_j - 1
 
 
         if (weight >  0 and weight > node_i.wp) :
@@ -345,36 +369,19 @@ class cycle_configuration_graph() :
         self.__num_cycles           = False
         self.__num_odd_cycles       = False
         self.__num_balanced_cycles  = False                
-        self.reset_indices()
+        self.reset_indices(min(node_i.index, node_j.index),
+                           max(node_i.index, node_j.index) + 1)
         return unp_i, unp_j
 
     # reversal when model has indels
     def reversal2(self, i, j, x, y, nweight_i, nweight_j) :
-        node_i = None
-        node_j = None
-
-        unp_i, unp_j = 0,0
-
-        count     = 0
-        unp_count = 0
         ## These variables are used to return the reversal
         ## applied as integer. ret_i, and ret_j will be the same
         ## as i,j if we do not have ignored black edges
-        node = self.begin_node
         # Find the black edges
-
-        while node :
-            count = count + 1
-            if not node.padded :
-                unp_count = unp_count + 1
-
-            if count == i :
-                node_i = node
-                unp_i  = unp_count
-            if count == j+1 :
-                node_j = node
-                unp_j  = unp_count - 1
-            node = node.ap.ab
+        node_i, unp_i = self.black_edge(i)
+        node_j, unp_j = self.black_edge(j+1)
+        unp_j = unp_j - 1
 
 
         if (x < 0) or (x > sum(node_i.wp)) :
@@ -439,31 +446,18 @@ class cycle_configuration_graph() :
         self.__num_cycles           = False
         self.__num_odd_cycles       = False
         self.__num_balanced_cycles  = False                
-        self.reset_indices()
+        self.reset_indices(min(node_i.index, node_j.index),
+                           max(node_i.index, node_j.index) + 1)
         return unp_i, unp_j
 
     def indel(self, is_insertion, i, x, elements, intergenic_regions) :
-        node_i = None
-        unp_i = 0
-
-        count     = 0
-        unp_count = 0
         ## These variables are used to return the indel
         ## applied as integer. ret_i will be the same
         ## as i if we do not have ignored black edges
 
-        node = self.begin_node
         # Find the black edges
-
-        while node :
-            count = count + 1
-            if not node.padded :
-                unp_count = unp_count + 1
-
-            if count == i :
-                node_i = node
-                unp_i  = unp_count
-            node = node.ap.ab
+        node_i, unp_i = self.black_edge(i)
+        position_i    = node_i.index
 
         if (x > sum(node_i.wp)) :
             print("ERRO: Posicao da delecao superior ao tamanho total da regiao intergenica: (wp = %s: del = %s: pos_x_size = %s)" % (
@@ -561,6 +555,10 @@ class cycle_configuration_graph() :
                 new_nodes[-1].ap.lp = len(new_nodes[-1].ap.wp)-1
 
                 self.set_values()
+                # The new records shift every position after node_i
+                self.__nodes[position_i+1:position_i+1] = new_nodes
+                self.reset_indices(position_i, position_i + number_of_new_nodes + 1)
+                self.shift_indices(position_i + number_of_new_nodes + 2)
 
 
         else : #we have a deletion
@@ -607,7 +605,7 @@ class cycle_configuration_graph() :
         self.__num_cycles           = False
         self.__num_odd_cycles       = False
         self.__num_balanced_cycles  = False                
-        self.reset_indices()
+        self.reset_indices(position_i, position_i + 1)
         return unp_i
 
     ############################################################                
@@ -658,40 +656,40 @@ class cycle_configuration_graph() :
 
             
 
+    ## Returns the cycles in the order they are found walking from
+    ## end_node to begin_node. Each cycle starts in its vertex with the
+    ## largest odd index and follows ap first. The result is kept until
+    ## the graph changes, so it must not be modified by the caller.
     def get_cycles(self, want_vertices = False) :
-        self.clean_visit()        
-
-        node = self.end_node        
-        cycles    = []
-        vertices  = []
-
-        while node :
-            if not node.visit :
-                cycle_node  = node
-                cycle       = []
-                cycle_nodes = []
-
-                while not cycle_node.visit :
-                    if cycle_node.index % 2 == 0 :
-                        cycle.append( -(cycle_node.index+2)/2 )
-                    else :
-                        cycle.append( +(cycle_node.index+1)/2 )
-
-
-                    cycle_node.visit = True
-                    cycle_nodes.append(cycle_node)
-                    cycle_node = cycle_node.ap
-                    cycle_node.visit  = True
-                    cycle_nodes.append(cycle_node)
-                    cycle_node = cycle_node.ac
-                    
-                cycles.append(tuple(cycle))
+        self.calculate_cycles()
+
+        if self.__cycles_view is None :
+            cycles    = []
+            vertices  = []
+            for identifier in self.__cycle_order :
+                record = self.__cycles[identifier]
+                cycle_nodes = record[0]
+                ## Insertions shift the indices of the cycles in their
+                ## right, their elements are updated here.
+                if cycle_nodes[0].index != record[2] :
+                    record[1] = self.__cycle_elements(cycle_nodes)
+                    record[2] = cycle_nodes[0].index
+                cycles.append(record[1])
                 vertices.append(cycle_nodes)
+            self.__cycles_view = (tuple(cycles), vertices)
 
-            node = node.ap.ab
         if want_vertices :
-            return tuple(cycles), vertices
-        return tuple(cycles)
+            return self.__cycles_view
+        return self.__cycles_view[0]
+
+    ## Generates the vertices of the cycles of a class (see the
+    ## constants in the beginning of this file), in the same order as
+    ## get_cycles. The graph must not be changed while iterating.
+    def get_cycles_of_class(self, cycle_class) :
+        self.calculate_cycles()
+
+        for identifier in self.__cycle_classes[cycle_class] :
+            yield self.__cycles[identifier][0]
 
 
     def permutation(self) :
@@ -729,26 +727,61 @@ class cycle_configuration_graph() :
             else :
                 node.value = -(node.ac.value - 1)
     
-    def reset_indices(self) :
-        node  = self.begin_node 
-        count = 0
-
+    ## Returns the record in the left of the i-th black edge (1 <= i
+    ## <= n) and the number of unpadded black edges up to it. The
+    ## records are found by position, so no traversal is needed.
+    ## This class never creates padded records, hence the count is i.
+    def black_edge(self, i) :
+        return self.__nodes[2*(i-1)], i
+
+    ## Updates index, lp and lc of the records from position start to
+    ## position end (by default, the whole graph), walking from the
+    ## record in position start. The operations call it only on the
+    ## segment they changed, so the record in position start must not
+    ## have been moved by the operation. The cycles through the
+    ## records that were or are now in these positions will be traced
+    ## again by calculate_cycles.
+    def reset_indices(self, start = 0, end = None) :
+        nodes = self.__nodes
+        dirty = self.__dirty_nodes
+
+        if end is None :
+            self.__all_dirty = True
+        else :
+            ## Forgetting the cycles while their indices are still the
+            ## ones used to order them.
+            for count in range(start, end+1) :
+                self.__forget_cycle(nodes[count].cycle)
+                dirty.append(nodes[count])
+
+        node  = nodes[start]
+        count = start
         while node :
+            if count < len(nodes) :
+                nodes[count] = node
+            else :
+                nodes.append(node)
             node.index = count
+            dirty.append(node)
 
             node.lp    = len(node.wp)-1
             node.lc    = len(node.wc)-1
 
-            node       = node.ap
+            if count == end :
+                break
+            if count % 2 == 0 :
+                node = node.ap
+            else :
+                node = node.ab
             count      = count + 1
-            
-            node.index = count
 
-            node.lp    = len(node.wp)-1
-            node.lc    = len(node.wc)-1
-
-            node       = node.ab
-            count      = count + 1
+    ## Updates the index of every record from position start on, after
+    ## records were inserted in self.__nodes. The cycles in the right
+    ## are only shifted, so their order and information do not change.
+    def shift_indices(self, start) :
+        nodes = self.__nodes
+        for count in range(start, len(nodes)) :
+            nodes[count].index = count
 
     def num_cycles(self) :
         if type(self.__num_cycles) == bool :
@@ -761,58 +794,216 @@ class cycle_configuration_graph() :
         return self.__num_odd_cycles
 
 
+    ## Updates the cycles and the information stored in their vertices
+    ## (size, weights, direction, labels and cycle identifier). Only
+    ## the cycles through records changed since the last call are
+    ## traced again, the others are kept as they are. Hence, nothing is
+    ## done if the graph did not change.
     def calculate_cycles(self) :
-        cycles, vertices = self.get_cycles(want_vertices = True)
-        num_cycles = len(cycles)
-        num_odd = 0
-        is_labeled = False
+        if self.__all_dirty :
+            self.__cycles         = {}
+            self.__cycle_order    = []
+            self.__cycle_classes  = [[] for _ in range(NUM_CYCLE_CLASSES)]
+            self.__num_odd_cycles = 0
+            dirty = self.__nodes
+        else :
+            dirty = self.__dirty_nodes
+            if not dirty :
+                return
+
+        self.__all_dirty    = False
+        self.__dirty_nodes  = []
+        self.__cycles_view  = None
+
+        first = self.__next_cycle
+        for node in dirty :
+            if node.cycle < first :
+                self.__add_cycle(node)
+        self.__num_cycles = len(self.__cycles)
+
+    ## Position of the first cycle in order (self.__cycle_order or a
+    ## class) whose first vertex has an index not greater than key.
+    def __cycle_position(self, order, key) :
+        cycles = self.__cycles
+        low, high = 0, len(order)
+        while low < high :
+            middle = (low + high) // 2
+            if cycles[order[middle]][0][0].index > key :
+                low = middle + 1
+            else :
+                high = middle
+        return low
+
+    def __forget_cycle(self, identifier) :
+        if identifier in self.__cycles :
+            cycle_nodes = self.__cycles[identifier][0]
+            key = cycle_nodes[0].index
+            del self.__cycle_order[self.__cycle_position(self.__cycle_order, key)]
+            for cycle_class in self.__cycles[identifier][3] :
+                order = self.__cycle_classes[cycle_class]
+                del order[self.__cycle_position(order, key)]
+            del self.__cycles[identifier]
+            if len(cycle_nodes) % 4 == 2 :
+                self.__num_odd_cycles = self.__num_odd_cycles - 1
+            self.__cycles_view = None
+
+    def __cycle_elements(self, cycle_nodes) :
+        cycle = []
+        for k in range(0, len(cycle_nodes), 2) :
+            index = cycle_nodes[k].index
+            if index % 2 == 0 :
+                cycle.append( -(index+2)/2 )
+            else :
+                cycle.append( +(index+1)/2 )
+        return tuple(cycle)
+
+    ## Traces the cycle of node and sets the information of its
+    ## vertices.
+    def __add_cycle(self, node) :
+        cycle_nodes = []
+        cycle_node  = node
+        while True :
+            cycle_nodes.append(cycle_node)
+            cycle_node = cycle_node.ap
+            cycle_nodes.append(cycle_node)
+            cycle_node = cycle_node.ac
+            if cycle_node is node :
+                break
 
-        for cycle in cycles :
-            if len(cycle) % 2 == 1 :
-                num_odd = num_odd + 1
+        ## Starting from the vertex with the largest odd index. If we
+        ## arrived on it through ap, following ap first means walking
+        ## in the other direction.
+        start, key = 0, -1
+        for k in range(len(cycle_nodes)) :
+            index = cycle_nodes[k].index
+            if index % 2 == 1 and index > key :
+                start, key = k, index
+        if start % 2 == 0 :
+            cycle_nodes = cycle_nodes[start:] + cycle_nodes[:start]
+        else :
+            cycle_nodes = cycle_nodes[start::-1] + cycle_nodes[:start:-1]
+        cycle = self.__cycle_elements(cycle_nodes)
 
-        self.__num_cycles           = num_cycles
-        self.__num_odd_cycles       = num_odd
+        identifier = self.__next_cycle
+        self.__next_cycle = self.__next_cycle + 1
+        self.__cycle_order.insert(self.__cycle_position(self.__cycle_order, key), identifier)
+        if len(cycle) % 2 == 1 :
+            self.__num_odd_cycles = self.__num_odd_cycles + 1
 
-        for i in range(len(cycles)) :            
-            cycle = cycles[i]
-            size = len(cycle)
+        size = len(cycle)
 
-            direction = 1
-            for el in cycle :
-                if (el < 0) :
-                    direction = 2
-                    break
+        direction = 1
+        for el in cycle :
+            if (el < 0) :
+                direction = 2
+                break
 
-            blacks   = 0
-            grays    = 0
-            vertice_set = vertices[i]
-            is_gray_labeled = False
-            is_black_labeled = False
-            for vertex in vertice_set :
-                if (vertex.lc == 0) :
-                    grays   = grays   + vertex.wc[0]
-                else :
-                    is_gray_labeled = True
-                    grays   = grays   + vertex.wc[0] + vertex.wc[-1]
-                if (vertex.lp == 0):
-                    blacks  = blacks  + vertex.wp[0]
-                else :
-                    is_black_labeled = True
-                    blacks  = blacks  + vertex.wp[0] + vertex.wp[-1]
-            grays  = grays  / 2
-            blacks = blacks / 2
-
-            vertice_set = vertices[i]
-            for vertex in vertice_set :
-                vertex.size      = size
-                vertex.grays     = grays
-                vertex.blacks    = blacks
-                vertex.direction = direction                
-                #vertex.kind  = kind
-                vertex.cycle = i
-                vertex.gray_labeled = is_gray_labeled
-                vertex.black_labeled = is_black_labeled
+        blacks   = 0
+        grays    = 0
+        is_gray_labeled = False
+        is_black_labeled = False
+        for vertex in cycle_nodes :
+            if (vertex.lc == 0) :
+                grays   = grays   + vertex.wc[0]
+            else :
+                is_gray_labeled = True
+                grays   = grays   + vertex.wc[0] + vertex.wc[-1]
+            if (vertex.lp == 0):
+                blacks  = blacks  + vertex.wp[0]
+            else :
+                is_black_labeled = True
+                blacks  = blacks  + vertex.wp[0] + vertex.wp[-1]
+        grays  = grays  / 2
+        blacks = blacks / 2
+
+        for vertex in cycle_nodes :
+            vertex.size      = size
+            vertex.grays     = grays
+            vertex.blacks    = blacks
+            vertex.direction = direction                
+            #vertex.kind  = kind
+            vertex.cycle = identifier
+            vertex.gray_labeled = is_gray_labeled
+            vertex.black_labeled = is_black_labeled
+
+        ## The conditions below are the ones tested by the lemmas
+        vertex  = cycle_nodes[0]
+        classes = []
+        if size == 1 and vertex.lp == 0 and (
+             (vertex.lc == 0 and blacks != grays) or
+             (vertex.lc > 0 and blacks <= grays)
+        ) :
+            classes.append(TRIVIAL_UNBALANCED)
+        if size == 1 and (vertex.lp > 0 or blacks > grays) :
+            classes.append(TRIVIAL_BLACK_LABELED)
+        if direction == 2 and (is_gray_labeled or is_black_labeled) :
+            classes.append(DIVERGENT_LABELED)
+        if direction == 2 and not is_gray_labeled and not is_black_labeled :
+            classes.append(DIVERGENT_CLEAN)
+        if size > 1 :
+            classes.append(NON_TRIVIAL)
+        if size > 2 :
+            ## Same test as Intergenic_Rev.is_oriented: the indices of
+            ## the black edges, in the order they are visited, increase
+            ## more than once.
+            indices = [cycle_node.index for cycle_node in cycle_nodes[::2]]
+            ascents = 0
+            for t in range(len(indices)) :
+                if indices[t-1] < indices[t] :
+                    ascents = ascents + 1
+            classes.append(ORIENTED if ascents > 1 else NON_ORIENTED)
+
+        for cycle_class in classes :
+            order = self.__cycle_classes[cycle_class]
+            order.insert(self.__cycle_position(order, key), identifier)
+        self.__cycles[identifier] = [cycle_nodes, cycle, key, classes, None]
+
+    ## Returns the record in a position of the graph.
+    def get_node(self, index) :
+        return self.__nodes[index]
+
+    ## Returns the indices of the right records of the black edges of
+    ## a cycle (the odd ones), in increasing order. They are computed
+    ## when first needed and kept until the cycle changes or is
+    ## shifted by an insertion.
+    def get_odd_indices(self, identifier) :
+        record = self.__cycles[identifier]
+        key = record[0][0].index
+        if record[4] is None or record[4][0] != key :
+            odd = [vertex.index for vertex in record[0] if vertex.index % 2 == 1]
+            odd.sort()
+            record[4] = (key, odd)
+        return record[4][1]
+
+    ## Returns a dictionary mapping each cycle that has right records
+    ## (odd indices) both strictly between the odd indices a and b and
+    ## outside [a, b] to the leftmost of its records between a and b.
+    ## Only non-trivial cycles have more than one right record, so
+    ## either their odd indices (get_odd_indices) are searched for the
+    ## interval, or the positions of the interval are visited, whichever
+    ## is fewer: the query costs O(min(b - a, c log s)) for c
+    ## non-trivial cycles of at most s black edges.
+    def get_crossing_cycles(self, a, b) :
+        self.calculate_cycles()
+        non_trivial = self.__cycle_classes[NON_TRIVIAL]
+
+        crossing = {}
+        if len(non_trivial) < (b - a) // 2 :
+            for identifier in non_trivial :
+                odd = self.get_odd_indices(identifier)
+                inside = bisect.bisect_right(odd, a)
+                if inside < len(odd) and odd[inside] < b and (odd[0] < a or odd[-1] > b) :
+                    crossing[identifier] = self.__nodes[odd[inside]]
+            return crossing
+
+        for node in self.__nodes[a+2:b:2] :
+            if node.cycle not in crossing :
+                crossing[node.cycle] = node
+        for identifier in list(crossing) :
+            odd = self.get_odd_indices(identifier)
+            if not (odd[0] < a or odd[-1] > b) :
+                del crossing[identifier]
+        return crossing
 
     def clean_visit(self) :
         node = self.begin_node
@@ -838,10 +1029,15 @@ class cycle_configuration_graph() :
 ## guarantee that the final permutation is the identity.
 
 class Intergenic_Rev :
-    def __init__(self, cycles, wgray, wblack, final_length) :
-        self.input_cycles  = str(cycles).replace(" ", "")
-        self.input_wgray   = str(wgray).replace(" ", "")[1:-1]
-        self.input_wblack  = str(wblack).replace(" ", "")[1:-1]
+    ## With distance_only, the sequence of operations is not kept and
+    ## the input is not converted to text: only the number of
+    ## operations of each kind is returned (see sort_result).
+    def __init__(self, cycles, wgray, wblack, final_length, distance_only = False) :
+        self.distance_only = distance_only
+        if distance_only :
+            self.input_cycles = self.input_wgray = self.input_wblack = None
+        else :
+            self.input_cycles, self.input_wgray, self.input_wblack = format_input(cycles, wgray, wblack)
                         
         self.graph      = cycle_configuration_graph(cycles,
                                                     wgray,
@@ -863,8 +1059,24 @@ class Intergenic_Rev :
                 num_balanced = num_balanced + 1
         return num_balanced
     
+    ## Sorts the graph and returns the result line: the input, the
+    ## number of operations, the sequence of operations, the
+    ## approximation ratio and the running time.
     def sort(self, start_time, is_3approx) :
-        sequence = []
+        return self.sort_result(start_time, is_3approx).line()
+
+    ## Sorts the graph and returns the result as a
+    ## result_format.SortResult, with the sequence of operations
+    ## (unless distance_only was given) and the number of operations
+    ## of each kind.
+    def sort_result(self, start_time, is_3approx) :
+        input, sequence = None, None
+        if not self.distance_only :
+            input = (self.input_cycles, self.input_wgray, self.input_wblack)
+            sequence = []
+        ## Operations applied, by kind (DEL, INS and REV, as the first
+        ## field of the operations)
+        counts = [0, 0, 0]
         graph = self.graph
 
         graph.calculate_cycles()
@@ -878,6 +1090,15 @@ class Intergenic_Rev :
         #lowerb = (1.0*lbc)/2.0
         ##lowerrev
         lowerb = 1.0*lbc
+
+        ## The lower bound is zero only if every cycle is trivial, clean
+        ## and balanced, i.e. the genomes are already equal. Nothing is
+        ## sorted and the empty sequence is optimal.
+        if lowerb == 0 :
+            return result_format.SortResult(0, 0, 1.0, time.time() - start_time,
+                                            operations = sequence, input = input,
+                                            counts = dict(zip(result_format.KINDS, counts)))
+
         while True :
             #print graph.get_cycles()
             #print graph.to_string()
@@ -917,13 +1138,17 @@ class Intergenic_Rev :
                         print("OPERACAO", op)
                     if op[0] == 0 :
                         graph.indel(op[0], op[1],op[2],op[3][0], op[3][1])
-                        sequence.append(tuple(['DEL', op[1], op[2], op[3][0], op[3][1]]))
+                        if sequence is not None :
+                            sequence.append(tuple(['DEL', op[1], op[2], op[3][0], op[3][1]]))
                     if op[0] == 1 :
                         graph.indel(op[0], op[1],op[2],op[3][0], op[3][1])
-                        sequence.append(tuple(['INS', op[1], op[2], op[3][0], op[3][1]]))
+                        if sequence is not None :
+                            sequence.append(tuple(['INS', op[1], op[2], op[3][0], op[3][1]]))
                     if op[0] == 2 :
                         graph.reversal2(op[1],op[2],op[3][0], op[3][1], op[3][2], op[3][3])
-                        sequence.append(tuple(['REV',op[1],op[2],op[3][0],op[3][1]]))
+                        if sequence is not None :
+                            sequence.append(tuple(['REV',op[1],op[2],op[3][0],op[3][1]]))
+                    counts[op[0]] = counts[op[0]] + 1
                     if DEBUG :
                         print(graph.to_string())
                     #print(op)
@@ -933,10 +1158,10 @@ class Intergenic_Rev :
             # Abaixo apenas depuracao        
             ##################################################
             graph.calculate_cycles()
-            _, vertices = graph.get_cycles(want_vertices = True)
-            num_balanced = self.get_num_balanced(vertices)
             #print(graph.to_string())
             if DEBUG :
+                _, vertices = graph.get_cycles(want_vertices = True)
+                num_balanced = self.get_num_balanced(vertices)
                 print("NUM BALANCED -->%s \n" % num_balanced)
             #sys.exit()
             
@@ -948,31 +1173,18 @@ class Intergenic_Rev :
             if vertice[0].grays == vertice[0].blacks :
                 num_balanced = num_balanced + 1
 
+        length = sum(counts)
         if num_balanced == graph.final_n :
-            if (((1.0*len(sequence))/lowerb) <= 3) :
-                print('%s [%s] [%s] %d %s %f %f' % (self.input_cycles,
-                               self.input_wgray,
-                               self.input_wblack,
-                               len(sequence),
-                               str(sequence).replace(" ", ""),
-                               len(sequence)/lowerb,
-                               float(time.time() - start_time)))
+            if (((1.0*length)/lowerb) <= 3) :
+                status = result_format.OK
             else :
-                print('%s [%s] [%s] %d %s %f %f ERROR-LOWER-BOUND-HIGHER' % (self.input_cycles,
-                               self.input_wgray,
-                               self.input_wblack,
-                               len(sequence),
-                               str(sequence).replace(" ", ""),
-                               len(sequence)/lowerb,
-                               time.time() - start_time))
+                status = result_format.LOWER_BOUND_HIGHER
         else :
-            print('%s [%s] [%s] %d %s %f %f ERROR-NOT-SORTED' % (self.input_cycles,
-                               self.input_wgray,
-                               self.input_wblack,
-                               len(sequence),
-                               str(sequence).replace(" ", ""),
-                               len(sequence)/lowerb,
-                               time.time() - start_time))
+            status = result_format.NOT_SORTED
+        return result_format.SortResult(length, lbc, length/lowerb,
+                                        time.time() - start_time, status,
+                                        operations = sequence, input = input,
+                                        counts = dict(zip(result_format.KINDS, counts)))
      
 
     def format_node_to_operations_indel(self,operation) :
@@ -1078,33 +1290,42 @@ class Intergenic_Rev :
         if b.index % 2 == 0 :
             b = b.ap
 
-        half1 = {}
-        half2 = {}
-        
-        ## starting the search
-        node = graph.end_node
-        while node != b :
-            half1[node.cycle] = node
-            node = node.ap.ab
-                    
-        node = b.ap.ab
-        while node != a :
-            half2[node.cycle] = node
-            node = node.ap.ab
-        
-        node = a.ap.ab
-        while node :
-            half1[node.cycle] = node
-            node = node.ap.ab
+        ## We look for cycles with right records both inside (half2)
+        ## and outside (half1) the interval (a, b). They are tested in
+        ## the order they would be found walking from end_node to
+        ## begin_node: first the cycles with records in the right of b,
+        ## by their rightmost record, then the cycles with records in
+        ## the left of a, by their rightmost record in the left of a.
+        ## The record used for a cycle outside the interval is its
+        ## leftmost one in the left of a, or in the right of b if it
+        ## has none in the left of a. Inside, it is the leftmost one.
+        half2 = graph.get_crossing_cycles(a.index, b.index)
+
+        right, left = [], []
+        for key in half2 :
+            odd = graph.get_odd_indices(key)
+            if odd[-1] > b.index :
+                right.append((odd[-1], key))
+            elif odd[0] < a.index :
+                left.append((odd[bisect.bisect_left(odd, a.index) - 1], key))
+        right.sort(reverse = True)
+        left.sort(reverse = True)
+
+        ## a and b bound the interval for every candidate, so the pair
+        ## tested is kept in u and w.
+        for _, key in right + left :
+            odd = graph.get_odd_indices(key)
+            if odd[0] < a.index :
+                half1 = graph.get_node(odd[0])
+            else :
+                half1 = graph.get_node(odd[bisect.bisect_right(odd, b.index)])
 
-        for key in list(half1.keys()) :
-            if key in half2 :
-                a,b = half1[key], half2[key]
-                if ( key != v_i.cycle or
-                     self.__check_convergency(graph, a, b) ) :
-                    if a.index > b.index :
-                        a,b = b,a
-                    return a,b
+            u,w = half1, half2[key]
+            if ( key != v_i.cycle or
+                 self.__check_convergency(graph, u, w) ) :
+                if u.index > w.index :
+                    u,w = w,u
+                return u,w
 
     ## This is an auxiliary method called in the next method for
     ## simplicity. Remember we are talking about reversals. In order
@@ -1163,37 +1384,68 @@ class Intergenic_Rev :
             return op
 
 
-    def find_all_triples(self, cycle) :
-        triples = []
-        k = cycle[0]
-
-        while True :  ## Loop over k
-            i = k.ap.ac
-            while True : ## Loop over i
-                j = i.ap.ac                
-                while True : ## Loop over j
-                    if (k.index > j.index > i.index) :
-                        triples.append([i, j, k] )
-                    j = j.ap.ac
-                    if j.index == k.index :
-                        break
-                i = i.ap.ac
-                if i.ap.ac.index == k.index :
-                    break            
-            k = k.ap.ac
-            if k.index == cycle[0].index :
-                break
-            
-        #for triple in triples :
-        #    print("Triples: ", triple[0].index, triple[1].index, triple[2].index)        
-        return(triples)
+    ## Returns the right records of the black edges of a cycle in the
+    ## order they are visited by following ap.ac from cycle[0].
+    def __cycle_sequence(self, cycle) :
+        sequence = [cycle[0]]
+        node = cycle[0].ap.ac
+        while node.index != cycle[0].index :
+            sequence.append(node)
+            node = node.ap.ac
+        return sequence
+
+    ## A cycle is oriented if it has a triple (i, j, k) of black edges
+    ## visited in this order with k.index > j.index > i.index. It
+    ## does not have one only if the indices of its black edges, in
+    ## the order they are visited, are a rotation of a decreasing
+    ## sequence, i.e. if they increase only once (from the smallest
+    ## back to the largest).
+    def is_oriented(self, cycle) :
+        indices = [node.index for node in self.__cycle_sequence(cycle)]
+        if len(indices) < 3 :
+            return False
+        ascents = 0
+        for t in range(len(indices)) :
+            if indices[t-1] < indices[t] :
+                ascents = ascents + 1
+        return ascents > 1
+
+    ## Returns the first triple [i, j, k] of the cycle with k.index >
+    ## j.index > i.index, trying the black edges as k in the order
+    ## they are visited from cycle[0] and then, after k, the black
+    ## edges as i and as j in the order they are visited. Returns None
+    ## if the cycle is not oriented.
+    def find_first_triple(self, cycle) :
+        if not self.is_oriented(cycle) :
+            return None
+        sequence = self.__cycle_sequence(cycle)
+        size = len(sequence)
+
+        for t in range(size) :
+            k = sequence[t]
+            after = sequence[t+1:] + sequence[:t]
+
+            ## below[a] is the largest index smaller than k.index
+            ## among the black edges visited after after[a].
+            below = [-1] * len(after)
+            for a in range(len(after)-2, -1, -1) :
+                below[a] = below[a+1]
+                if below[a] < after[a+1].index < k.index :
+                    below[a] = after[a+1].index
+
+            for a in range(len(after)-1) :
+                i = after[a]
+                if i.index < below[a] :
+                    for j in after[a+1:] :
+                        if k.index > j.index > i.index :
+                            return [i, j, k]
+        return None
 
     ## First lemma, we will try to transform a trivial not black-labeled cycle
     ## that is (i) not balanced or (ii) gray-labeled and non-negative into a 
     ## balanced clean cycle using one indel
     def lemma_5(self, graph) :
-        _, vertices = graph.get_cycles(want_vertices = True)
-        for cycle in vertices :
+        for cycle in graph.get_cycles_of_class(TRIVIAL_UNBALANCED) :
             if cycle[0].size == 1 and cycle[0].lp == 0 and (
                  (cycle[0].lc == 0 and cycle[0].blacks != cycle[0].grays) or 
                  (cycle[0].lc > 0 and cycle[0].blacks <= cycle[0].grays)
@@ -1226,8 +1478,7 @@ class Intergenic_Rev :
     ## Second lemma, we will try to transform a trivial black-labeled cycle
     ## into a trivial not black-labeled cycle, and eventually apply lemma_5
     def lemma_6(self, graph) :
-        _, vertices = graph.get_cycles(want_vertices = True)
-        for cycle in vertices :
+        for cycle in graph.get_cycles_of_class(TRIVIAL_BLACK_LABELED) :
             if (cycle[0].size == 1) and (cycle[0].lp > 0 or cycle[0].blacks > cycle[0].grays) :
                 if (cycle[0].lp > 0) : #we will remove some alphas
                     if (cycle[0].wp[0] >= cycle[0].grays) :
@@ -1252,8 +1503,7 @@ class Intergenic_Rev :
     ## not black-labeled cycle and one cycle with the remaining edges
     ## after this lemma, we may apply lemma 5 in the trivial one.
     def lemma_7(self, graph) :
-        _, vertices = graph.get_cycles(want_vertices = True)
-        for cycle in vertices :
+        for cycle in graph.get_cycles_of_class(DIVERGENT_LABELED) :
             if (cycle[0].direction == 2) and (cycle[0].gray_labeled == True or cycle[0].black_labeled == True) :
                 start_point = cycle[0]
                 a = cycle[0]
@@ -1327,8 +1577,7 @@ class Intergenic_Rev :
     ##  ( ii) into two balanced cycles, if C is balanced
     ##  (iii) into one balanced cycle and one negative cycle otherwise
     def lemma_8(self, graph) :
-        _, vertices = graph.get_cycles(want_vertices = True)
-        for cycle in vertices :
+        for cycle in graph.get_cycles_of_class(DIVERGENT_CLEAN) :
             if (cycle[0].direction == 2) and (cycle[0].gray_labeled == False) and (cycle[0].black_labeled == False) :
 
                 if (cycle[0].grays > cycle[0].blacks) : ## C is a positive cycle
@@ -1366,8 +1615,7 @@ class Intergenic_Rev :
     # Lemma 9 of the preliminary version (paper presented at AlCoB 2021: Reversal Distance on Genomes with Different Gene Content and Intergenic Regions Information) 
     # This Lemma was replaced by two other lemmas in the final manuscript published at IEEE/ACM Transactions on Computational Biology and Bioinformatics
     def lemma_9(self, graph) :
-        _, vertices = graph.get_cycles(want_vertices = True)
-        for cycle in vertices :
+        for cycle in graph.get_cycles_of_class(NON_TRIVIAL) :
           if cycle[0].size > 1 :#and cycle[0].grays <= cycle[0].blacks :
             #print(str(cycle[0]),cycle[0].grays, cycle[0].blacks)
             for i in range(1, len(cycle) - 2, 2) :
@@ -1390,11 +1638,10 @@ class Intergenic_Rev :
                     partial_gray  = partial_gray  + v_j.wc[0]
                     partial_black = partial_black + v_j.wp[0]
         ##if there is no crossing cycles, all long cycles are oriented.
-        for cycle in vertices :
-          if cycle[0].size > 2 :#and cycle[0].grays <= cycle[0].blacks :
-            triples = self.find_all_triples(cycle)
-            if triples :
-                op = [triples[0][1], triples[0][2]]
+        for cycle in graph.get_cycles_of_class(ORIENTED) :
+            triple = self.find_first_triple(cycle)
+            if triple :
+                op = [triple[1], triple[2]]
                 cut_left_ir = sum(op[0].wp)
                 cut_right_ir = 0
                 res_left_ir = op[0].wp
@@ -1407,12 +1654,10 @@ class Intergenic_Rev :
     ## it into a divergent cycle
     ## This was changed to Lemma 9 in the final version of the paper
     def lemma_10(self, graph) :
-        _, vertices = graph.get_cycles(want_vertices = True)
-        for cycle in vertices :
-          if cycle[0].size > 2 :#and cycle[0].grays <= cycle[0].blacks :
-            triples = self.find_all_triples(cycle)
-            if triples :
-                op = [triples[0][1], triples[0][2]]
+        for cycle in graph.get_cycles_of_class(ORIENTED) :
+            triple = self.find_first_triple(cycle)
+            if triple :
+                op = [triple[1], triple[2]]
                 cut_left_ir = sum(op[0].wp)
                 cut_right_ir = 0
                 res_left_ir = op[0].wp
@@ -1424,8 +1669,7 @@ class Intergenic_Rev :
     ## last step: there are only non-oriented convergent cycles
     ## This was changed to Lemma 10 in  the final version of the paper
     def lemma_11(self, graph) :
-        _, vertices = graph.get_cycles(want_vertices = True)
-        for cycle in vertices :
+        for cycle in graph.get_cycles_of_class(NON_TRIVIAL) :
           if cycle[0].size > 1 :#and cycle[0].grays <= cycle[0].blacks :
             #print(str(cycle[0]),cycle[0].grays, cycle[0].blacks)
             for i in range(1, len(cycle) - 2, 2) :
@@ -1520,7 +1764,13 @@ def construct_black_edges(input_string, input_black) :
         wblack.append(interblack)
     return(wblack, input_string_numbers)
 
-def construct_str_cycle(input_string, input_gray, input_black) :
+## Builds the cycle decomposition of an instance. Returns the cycles,
+## each one as the list of the (absolute) elements visited starting
+## with a gray edge, so that cycle[2m], cycle[2m+1] is a gray edge and
+## cycle[2m+1], cycle[2m+2] a black edge, the permutation (with the
+## genes renumbered and the paddings 0 and n+1) and the weights of the
+## gray and black edges.
+def decompose_cycles(input_string, input_gray, input_black) :
 
     # Given the input_black weights, let us group them according
     # to the edges in the cycle graph (i.e., we just group the
@@ -1644,6 +1894,11 @@ def construct_str_cycle(input_string, input_gray, input_black) :
                             positive = True
             cycles.append(cycle)
 
+    return(cycles, permutation, wgray, wblack)
+
+def construct_str_cycle(input_string, input_gray, input_black) :
+    cycles, permutation, wgray, wblack = decompose_cycles(input_string, input_gray, input_black)
+
     int_position = get_position(permutation)
     canonicals = []
 
@@ -1652,6 +1907,381 @@ def construct_str_cycle(input_string, input_gray, input_black) :
 
     return(canonicals, wgray, wblack)
 
+## Weight of an edge given its intergenic sizes: the first and the
+## last sizes if the edge is labeled (has alphas), else its only size.
+def edge_weight(sizes) :
+    if len(sizes) > 1 :
+        return sizes[0] + sizes[-1]
+    return sizes[0]
+
+## Bounds of the distance of an instance, without sorting it: returns
+## (lower, upper_2_5, upper_3). The lower bound is the one used by
+## Intergenic_Rev.sort: the number of black edges minus the number of
+## clean (not labeled) balanced cycles. The upper bounds are the
+## lower bound times the approximation factor of each algorithm,
+## i.e. an estimate of the largest distance each one should find.
+## Only one walk over each cycle of the decomposition is made, no
+## cycle graph is built.
+def instance_bounds(permutation, wblack, wgray) :
+    cycles, padded, gray_sizes, black_sizes = decompose_cycles(permutation, wgray, wblack)
+    position = get_position(padded)
+
+    clean_balanced = 0
+    for cycle in cycles :
+        grays, blacks, labeled = 0, 0, False
+        for m in range(0, len(cycle), 2) :
+            sizes = gray_sizes[min(cycle[m], cycle[m+1])]
+            grays = grays + edge_weight(sizes)
+            labeled = labeled or len(sizes) > 1
+
+            ## The black edge between positions p and p+1 has the
+            ## p-th sizes
+            sizes = black_sizes[min(position[cycle[m+1]], position[cycle[(m+2) % len(cycle)]])]
+            blacks = blacks + edge_weight(sizes)
+            labeled = labeled or len(sizes) > 1
+        if not labeled and grays == blacks :
+            clean_balanced = clean_balanced + 1
+
+    lower = len(padded) - 1 - clean_balanced
+    return lower, int(math.floor(2.5 * lower)), 3 * lower
+
+## Bounds of one instance given as a text line or as its three lists.
+## It is the task of the process pool of instance_bounds_batch.
+def bounds_line(line) :
+    if isinstance(line, str) :
+        return instance_bounds(*parse_instance(line))
+    return instance_bounds(*line)
+
+## Bounds of many instances (text lines or triples of lists), in the
+## same order. With jobs > 1 they are computed by a pool of
+## processes, chunksize instances at a time.
+def instance_bounds_batch(instances, jobs = 1, chunksize = 256) :
+    if jobs <= 1 :
+        return [bounds_line(line) for line in instances]
+    pool = multiprocessing.Pool(jobs)
+    bounds = pool.map(bounds_line, instances, chunksize)
+    pool.close()
+    pool.join()
+    return bounds
+
+
+## Parses a comma-separated list of integers, such as "3,-1,0,2".
+## Square brackets around the list are accepted. It only splits the
+## text and converts each piece with int, which is much faster than
+## eval on long lists and does not run arbitrary expressions.
+def parse_list(field) :
+    field = field.strip().strip("[]").rstrip(",")
+    if not field :
+        return []
+    return list(map(int, field.split(",")))
+
+## Parses one instance given as three whitespace-separated fields, in
+## the same order as the command line arguments. Square brackets
+## around the lists are accepted, so the files produced by
+## Cyanorak/pairwise.py can be used directly.
+def parse_instance(line) :
+    fields = line.split()
+    if len(fields) != 3 :
+        raise ValueError("Expected three lists per instance, found %d" % len(fields))
+    permutation, wblack, wgray = [parse_list(field) for field in fields]
+    return permutation, wblack, wgray
+
+## Returns the input of the result line: the cycle configuration and
+## the intergenic sizes, as built by construct_str_cycle.
+def format_input(cycles, wgray, wblack) :
+    return (str(cycles).replace(" ", ""),
+            str(wgray).replace(" ", "")[1:-1],
+            str(wblack).replace(" ", "")[1:-1])
+
+## Builds the cycle graph of an instance and sorts it, returning the
+## result (a result_format.SortResult). If a cache (see
+## result_cache.py) is given, a result stored there is returned
+## without sorting, and new results are stored (when the cache is
+## flushed). A cached result is marked as such and keeps the time of
+## the sorting that stored it. If a profile (see
+## profiling.py) is given, the sorting is recorded in it. With
+## distance_only, the result has neither the sequence of operations
+## nor the input (see Intergenic_Rev).
+def sort_instance_result(permutation, wblack, wgray, is_3approx, start_time, cache = None,
+                         profile = None, distance_only = False) :
+    final_length = len(wgray)
+
+    if cache is not None :
+        key = result_cache.instance_key(permutation, wblack, wgray, is_3approx, SOLVER_VERSION)
+        cached = cache.get(key)
+
+    config, grayw, blackw = construct_str_cycle(permutation, wgray, wblack)
+    ## A result stored without its sequence is only used when the
+    ## sequence is not needed.
+    if cache is not None and cached is not None and (cached[1] is not None or distance_only) :
+        length, sequence, ratio, seconds, error = cached
+        input, counts = None, None
+        if distance_only :
+            if sequence is not None :
+                counts = dict((kind, sequence.count("('%s'" % kind)) for kind in result_format.KINDS)
+            sequence = None
+        else :
+            input = format_input(config, grayw, blackw)
+        return result_format.SortResult(length, result_format.lower_bound(length, ratio), ratio,
+                                        seconds, error or result_format.OK, input = input,
+                                        sequence_text = sequence, counts = counts, cached = True)
+
+    sort = Intergenic_Rev(config, grayw, blackw, final_length, distance_only)
+    if profile is not None :
+        profile.attach(sort)
+    result = sort.sort_result(start_time, is_3approx)
+    if cache is not None :
+        cache.put(key, result.distance, result.sequence_text(), result.ratio, result.seconds,
+                  result.error())
+    return result
+
+## Same as sort_instance_result, returning the result line.
+def sort_instance(permutation, wblack, wgray, is_3approx, start_time, cache = None, profile = None) :
+    return sort_instance_result(permutation, wblack, wgray, is_3approx, start_time, cache,
+                                profile).line()
+
+## Parses and sorts one line of a batch file. Every call builds its
+## own graph, nothing is shared between instances. The cache is given
+## as (filename, maximum size) and opened once by each process, its
+## new results are written by sort_chunk. distance_only is given to
+## sort_instance_result. A task without a line is an
+## instance already sorted (see sort_batch). The result is returned
+## as a result_format.SortResult. If profile is true, the records of
+## the profile of the instance are returned with it.
+def sort_line(task) :
+    line, is_3approx, cache, profile, distance_only = task
+    if line is None :
+        return None
+    seconds = time.time()
+    if isinstance(line, str) :
+        permutation, wblack, wgray = parse_instance(line)
+    else :
+        permutation, wblack, wgray = line
+    if cache is not None :
+        cache = result_cache.open_cache(*cache)
+    if profile :
+        profile = profiling.Profile()
+        result = sort_instance_result(permutation, wblack, wgray, is_3approx, seconds, cache, profile,
+                                      distance_only)
+        return result, profile.records
+    return sort_instance_result(permutation, wblack, wgray, is_3approx, seconds, cache,
+                                distance_only = distance_only)
+
+## Sorts a chunk of lines (see sort_line), returning the list of their
+## results. It is the task executed by each worker of the process
+## pool, so it must stay at module level to be picklable. The cache is
+## flushed at the end of the chunk, so its results are written in one
+## transaction per chunk.
+def sort_chunk(task) :
+    lines, is_3approx, cache, profile, distance_only = task
+    results = [sort_line((line, is_3approx, cache, profile, distance_only)) for line in lines]
+    if cache is not None :
+        result_cache.open_cache(*cache).flush()
+    return results
+
+## Iterates over the instances of a file: the lines of a text file, or
+## the three lists of each instance of a binary file (see
+## instance_format.py), already converted to lists so that they can be
+## sent to other processes.
+def read_instances(filename) :
+    if instance_format.is_binary(filename) :
+        for instance in instance_format.iter_instances(filename) :
+            yield tuple(values.tolist() for values in instance)
+        return
+
+    if filename == "-" :
+        f = sys.stdin
+    else :
+        f = open(filename, 'r')
+
+    for line in f :
+        if line.strip() :
+            yield line
+
+    if f is not sys.stdin :
+        f.close()
+
+## Progress journal of sort_batch: one line per sorted instance with
+## the file, the position of the instance in the file, a checksum of
+## the instance (and of the algorithm) and the result in JSON (with
+## its input, see result_format.py), separated by tabs. It is only
+## appended to, so after a crash every complete line is a finished
+## instance. A line cut by the crash is ignored, and removed by
+## read_journal before the next run appends to the journal (otherwise
+## the first new line would be glued to it). Results sorted with
+## distance_only have other checksums, so that they are not used by
+## runs that need the sequences (nor the other way around).
+def instance_checksum(line, is_3approx, distance_only = False) :
+    if not isinstance(line, str) :
+        line = " ".join(",".join(map(str, values)) for values in line)
+    text = "%s %s" % (line.strip(), is_3approx)
+    if distance_only :
+        text = text + " distance"
+    return "%08x" % zlib.crc32(text.encode())
+
+def read_journal(filename) :
+    done = {}
+    if not os.path.exists(filename) :
+        return done
+    complete = 0 # length of the complete lines
+    with open(filename, 'rb') as f :
+        for entry in f :
+            if not entry.endswith(b"\n") :
+                break
+            complete = complete + len(entry)
+            fields = entry.decode().split("\t")
+            if len(fields) != 4 :
+                continue
+            name, index, checksum, result = fields
+            done[(name, int(index))] = (checksum, result[:-1])
+    if complete < os.path.getsize(filename) :
+        os.truncate(filename, complete)
+    return done
+
+## Returns the result of a journal entry. Journals written before the
+## results were kept in JSON have the result line instead.
+def journal_result(text) :
+    if text.startswith("{") :
+        return result_format.SortResult.from_dict(json.loads(text))
+    return result_format.SortResult.from_line(text)
+
+## Extension of the output files of sort_batch in each format
+OUTPUT_EXTENSIONS = {"text" : ".out", "jsonl" : ".out.jsonl", "binary" : ".out.bin"}
+
+## Returns the output file of each input file of sort_batch, in
+## output_dir and named after the input file. Input files with the
+## same name in different directories would be written into the same
+## output file, so they are rejected (ValueError), as is an input file
+## given twice.
+def output_filenames(filenames, output_dir, output_format) :
+    outputs, sources = [], {}
+    for filename in filenames :
+        output = os.path.join(output_dir, os.path.basename(filename) + OUTPUT_EXTENSIONS[output_format])
+        source = os.path.abspath(filename) if filename != "-" else filename
+        if output in sources :
+            if sources[output] == source :
+                raise ValueError("%s is given twice" % source)
+            raise ValueError("%s and %s would both be written into %s" % (sources[output], source, output))
+        sources[output] = source
+        outputs.append(output)
+    return outputs
+
+## Sorts every instance of the given files (or stdin if a filename is
+## "-"). One result is written for each instance, in the same order,
+## in the given output format (see result_format.py): by default the
+## result line used for a single instance. The sequences of
+## operations are left out if with_sequence is false. If output_dir
+## is given, the results of each file go to output_dir/<file>.out
+## (.out.jsonl or .out.bin in the other formats, see
+## output_filenames), which is written even if the file has no
+## instances, otherwise everything is printed. Each output file is
+## written under a temporary name and renamed when complete, so it is
+## never left truncated.
+
+## With jobs > 1 the instances are spread over a pool of processes.
+## They are sent in chunks of chunksize lines to keep the per-task
+## overhead low, and the results are written back in input order.
+## The cache, if any, is given as (filename, maximum size in bytes),
+## its new results are written once per chunk.
+
+## If a journal file is given, every result is appended to it as soon
+## as it is known. Running again with the same journal skips the
+## instances already there (if they did not change) and writes the
+## same output as an uninterrupted run.
+
+## If profile is true, the sorting of every instance is profiled (see
+## profiling.py) and the summary of the whole run is written to
+## stderr at the end. With distance_only, the instances are sorted
+## without keeping the sequences (see Intergenic_Rev), so the
+## results have neither the sequence nor the input.
+def sort_batch(filenames, is_3approx, jobs = 1, chunksize = 32, output_dir = None, cache = None,
+               journal = None, profile = False, output_format = "text", with_sequence = True,
+               distance_only = False) :
+    outputs = None
+    if output_dir is not None :
+        outputs = output_filenames(filenames, output_dir, output_format)
+    done, log = {}, None
+    if journal is not None :
+        done = read_journal(journal)
+        log = open(journal, 'a')
+
+    # The filenames are kept in the main process, only the lines
+    # travel to the workers, in chunks of chunksize lines. Instances
+    # in the journal are not sent.
+    origins = []
+    def chunks() :
+        lines = []
+        for number, filename in enumerate(filenames) :
+            name = os.path.abspath(filename) if filename != "-" else filename
+            for index, line in enumerate(read_instances(filename)) :
+                checksum = instance_checksum(line, is_3approx, distance_only)
+                previous = done.get((name, index))
+                if previous is not None and previous[0] == checksum :
+                    origins.append((number, name, index, checksum, previous[1]))
+                    lines.append(None)
+                else :
+                    origins.append((number, name, index, checksum, None))
+                    lines.append(line)
+                if len(lines) == chunksize :
+                    yield (lines, is_3approx, cache, profile, distance_only)
+                    lines = []
+        if lines :
+            yield (lines, is_3approx, cache, profile, distance_only)
+
+    pool = None
+    if jobs > 1 :
+        pool = multiprocessing.Pool(jobs)
+        results = pool.imap(sort_chunk, chunks())
+    else :
+        results = map(sort_chunk, chunks())
+    results = itertools.chain.from_iterable(results)
+
+    # With output_dir, the output of the file at position current is
+    # open. advance closes it and opens the next ones up to the file
+    # at position number, so files without instances get empty
+    # outputs.
+    total = profiling.Profile() if profile else None
+    current, out = -1, None
+    if outputs is None :
+        out = result_format.open_writer(output_format, None, with_sequence)
+    def advance(number) :
+        nonlocal current, out
+        while current < number :
+            if out is not None :
+                out.close()
+                os.replace(outputs[current] + ".tmp", outputs[current])
+            current = current + 1
+            out = None
+            if current < len(outputs) :
+                out = result_format.open_writer(output_format, outputs[current] + ".tmp", with_sequence)
+
+    for count, result in enumerate(results) :
+        number, name, index, checksum, previous = origins[count]
+        if result is not None and profile :
+            result, records = result
+            total.merge(records)
+        if result is None :
+            result = journal_result(previous)
+        elif log is not None :
+            log.write("%s\t%d\t%s\t%s\n" % (name, index, checksum, result.to_json(with_input = True)))
+            log.flush()
+
+        if outputs is not None :
+            advance(number)
+        out.write(result)
+
+    if outputs is not None :
+        advance(len(outputs))
+    else :
+        out.close()
+    if log is not None :
+        log.close()
+    if pool :
+        pool.close()
+        pool.join()
+    if total is not None :
+        sys.stderr.write(total.summary() + "\n")
+
 
 ## This main function expects three lists as input (separated by spaces):
 ##     (i) a comma-separated list with integer numbers. The number 0 is considered 
@@ -1662,11 +2292,120 @@ def construct_str_cycle(input_string, input_gray, input_black) :
 ##   (iii) a comma-separated list of non-negative integers, it represents intergenic
 ##          sizes of the target genome
 
+## Alternatively, the option --batch FILE sorts every instance of FILE
+## (one instance per line, with the three lists above separated by
+## spaces, or a binary file written by instance_format.py) in a single
+## process. Use "-" to read the instances from
+## stdin and --3approx to select the 3-approximation algorithm. The
+## option may be repeated, which is useful for the pairwise corpora
+## of Cyanorak (one instance per file). Large genomes should be given
+## this way, since long lists may exceed the limit on the size of the
+## command line. Other options:
+##    --jobs N       sorts the instances using N processes
+##    --chunksize N  number of instances sent to a worker at a time
+##                   (use small values when instances are large)
+##    --output-dir D writes the results of FILE into D/FILE.out (empty
+##                   if FILE has no instances). Files with the same
+##                   name in different directories are rejected.
+##    --cache FILE   keeps the results in FILE (see result_cache.py)
+##                   and reuses the ones found there instead of sorting
+##                   again. Their time is the time of the sorting that
+##                   stored them, and they are marked "cached" in the
+##                   jsonl format. By default, nothing is cached.
+##    --cache-size M maximum size of the cache in megabytes (512)
+##    --journal J    appends each result to the journal J, and skips
+##                   the instances already in J when run again (to
+##                   resume an interrupted run)
+##    --format F     writes the results as text (the result line, by
+##                   default), jsonl or binary (see result_format.py)
+##    --no-sequence  leaves the sequences of operations out of the
+##                   results written
+##    --distance-only
+##                   sorts without keeping the sequences of operations
+##                   nor the input, which is faster and uses less
+##                   memory when only the distances are needed (the
+##                   results then have "-" in their place)
+##    --bounds       does not sort: writes the bounds of each instance
+##                   (see instance_bounds), "LOWER UPPER_2.5 UPPER_3",
+##                   which is much faster, to screen the instances
+##    --profile      writes to stderr, at the end, the calls and time
+##                   of each lemma and graph operation (see
+##                   profiling.py). Cached results are not profiled.
+
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1].startswith('--') :
+        try :
+            opts, args = getopt.getopt(sys.argv[1:], "", ["batch=", "3approx", "jobs=",
+                                                          "chunksize=", "output-dir=",
+                                                          "cache=", "cache-size=",
+                                                          "journal=", "profile", "format=",
+                                                          "no-sequence", "distance-only", "bounds"])
+        except getopt.GetoptError as err :
+            print(err)
+            sys.exit(2)
+
+        batch_files = []
+        is_3approx = False
+        jobs, chunksize, output_dir, journal, profile = 1, 32, None, None, False
+        output_format, with_sequence, distance_only, bounds = "text", True, False, False
+        cache_filename, cache_size = None, result_cache.DEFAULT_MAX_SIZE
+        for opt, arg in opts :
+            if opt == "--batch" :
+                batch_files.append(arg)
+            if opt == "--3approx" :
+                is_3approx = True
+            if opt == "--jobs" :
+                jobs = int(arg)
+            if opt == "--chunksize" :
+                chunksize = int(arg)
+            if opt == "--output-dir" :
+                output_dir = arg
+            if opt == "--cache" :
+                cache_filename = arg
+            if opt == "--cache-size" :
+                cache_size = int(arg) * 1024 * 1024
+            if opt == "--journal" :
+                journal = arg
+            if opt == "--profile" :
+                profile = True
+            if opt == "--format" :
+                output_format = arg
+            if opt == "--no-sequence" :
+                with_sequence = False
+            if opt == "--distance-only" :
+                distance_only = True
+            if opt == "--bounds" :
+                bounds = True
+
+        if not batch_files :
+            print("Missing --batch FILE")
+            sys.exit(2)
+        cache = None
+        if cache_filename is not None :
+            cache = (cache_filename, cache_size)
+        if bounds :
+            for filename in batch_files :
+                for lower, upper_2_5, upper_3 in instance_bounds_batch(list(read_instances(filename)),
+                                                                       jobs, chunksize) :
+                    print("%d %d %d" % (lower, upper_2_5, upper_3))
+            sys.exit()
+        if output_format not in result_format.FORMATS :
+            print("Unknown format %s (use %s)" % (output_format, ", ".join(result_format.FORMATS)))
+            sys.exit(2)
+        if output_dir is not None :
+            try :
+                output_filenames(batch_files, output_dir, output_format)
+            except ValueError as err :
+                print(err)
+                sys.exit(2)
+        sort_batch(batch_files, is_3approx, jobs, chunksize, output_dir, cache, journal, profile,
+                   output_format, with_sequence, distance_only)
+        sys.exit()
+
     seconds = time.time()
-    permutation = eval("[%s]" % sys.argv[1])
-    wblack = eval("[%s]" % sys.argv[2])
-    wgray  = eval("[%s]" % sys.argv[3])
+    permutation = parse_list(sys.argv[1])
+    wblack = parse_list(sys.argv[2])
+    wgray  = parse_list(sys.argv[3])
 
     # Use is_3approx for the algorithm published at AlCoB'2021 (preliminary version of the paper): Reversal Distance on Genomes with Different Gene Content and Intergenic Regions Information
     # The default version is the 2.5-approximation published at IEEE/ACM Transactions on Computational Biology and Bioinformatics
@@ -1676,8 +2415,4 @@ if __name__ == '__main__':
         is_3approx = False
 
     # print("is_3approx", is_3approx)
-    final_length = len(wgray)
-
-    config, grayw, blackw = construct_str_cycle(permutation, wgray, wblack)
-    sort = Intergenic_Rev(config, grayw, blackw, final_length)
-    sort.sort(seconds, is_3approx)
+    print(sort_instance(permutation, wblack, wgray, is_3approx, seconds))
@@ -0,0 +1,70 @@
+# encoding: utf-8
+
+## Test of the journal of rev_indel_intergenic.sort_batch: a run
+## resumed from a journal cut by a crash (in the middle of a line) must
+## write the same results as a run without interruption, and leave a
+## complete journal.
+##
+##     python3 -m pytest tests/test_journal.py
+
+import os
+import sys
+import shutil
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+from rev_indel_intergenic import sort_batch, read_journal
+
+DATASET = os.path.join(root, 'Simulated_Instances', 'input_100', '10.in')
+INSTANCES = 30
+
+## Complete lines left in the journal by the crash
+KEPT = 12
+
+## The result lines without the running time (their seventh field)
+def read_output(filename) :
+    with open(filename) as f :
+        lines = [line.split() for line in f]
+    return [fields[:6] + fields[7:] for fields in lines]
+
+def test_resume_from_torn_journal(tmp_path) :
+    instances = str(tmp_path / "instances.in")
+    with open(DATASET) as f, open(instances, 'w') as out :
+        for _ in range(INSTANCES) :
+            out.write(next(f))
+
+    complete, resumed = tmp_path / "complete", tmp_path / "resumed"
+    complete.mkdir()
+    resumed.mkdir()
+    journal = str(tmp_path / "journal")
+    sort_batch([instances], False, output_dir = str(complete), journal = journal)
+
+    ## Crash in the middle of line KEPT + 1
+    torn = str(tmp_path / "torn")
+    with open(journal, 'rb') as f :
+        lines = f.readlines()
+    with open(torn, 'wb') as f :
+        f.write(b"".join(lines[:KEPT]) + lines[KEPT][:len(lines[KEPT]) // 2])
+    assert len(read_journal(shutil.copy(torn, str(tmp_path / "copy")))) == KEPT
+
+    sort_batch([instances], False, output_dir = str(resumed), journal = torn)
+    expected = read_output(str(complete / "instances.in.out"))
+    assert read_output(str(resumed / "instances.in.out")) == expected
+
+    ## Every instance is in the journal once, on a line of its own
+    with open(torn) as f :
+        entries = f.read().split("\n")
+    assert entries[-1] == ""
+    assert len(entries) - 1 == INSTANCES
+    done = read_journal(torn)
+    assert sorted(index for _, index in done) == list(range(INSTANCES))
+
+    ## Nothing is sorted again from a complete journal
+    shutil.rmtree(str(resumed))
+    resumed.mkdir()
+    with open(torn, 'rb') as f :
+        before = f.read()
+    sort_batch([instances], False, output_dir = str(resumed), journal = torn)
+    with open(torn, 'rb') as f :
+        assert f.read() == before
+    assert read_output(str(resumed / "instances.in.out")) == expected
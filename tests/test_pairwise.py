@@ -0,0 +1,50 @@
+# encoding: utf-8
+
+## Test of the reduction of Cyanorak/pairwise.py against the instances
+## of Cyanorak/INDEL-INTERGENIC, which were written by the original
+## implementation. A sample of the pairs (every STEP-th file, in name
+## order) is reduced again, and each instance must be byte-identical
+## to its file.
+##
+##     python3 -m pytest tests/test_pairwise.py
+
+import os
+import sys
+
+import pytest
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+CYANORAK = os.path.join(root, 'Cyanorak')
+CORPUS = os.path.join(CYANORAK, 'INDEL-INTERGENIC')
+
+sys.path.insert(0, CYANORAK)
+import pairwise
+
+## Pairs of the sample
+STEP = 97
+
+SEPARATOR = '-X-'
+
+def sample() :
+    names = sorted(name for name in os.listdir(CORPUS) if name.endswith('.pairwise'))
+    return names[::STEP]
+
+## Genomes and target maps, read once for the whole sample
+genomes = {}
+
+def genome(name) :
+    if name not in genomes :
+        genes, ir = pairwise.read_genome(os.path.join(CYANORAK, name))
+        genomes[name] = (genes, ir, pairwise.target_map(genes))
+    return genomes[name]
+
+@pytest.mark.parametrize("name", sample())
+def test_reduce_pair(name) :
+    source, target = name[:-len('.pairwise')].split(SEPARATOR)
+    source_genes, source_ir, _ = genome(source)
+    _, target_ir, map = genome(target)
+
+    assert pairwise.pair_filename(source, target) == name
+    line = pairwise.format_instance(*pairwise.reduce_pair(source_genes, source_ir, target_ir, map))
+    with open(os.path.join(CORPUS, name), 'rb') as f :
+        assert (line + '\n').encode() == f.read()
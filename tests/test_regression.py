@@ -0,0 +1,124 @@
+# encoding: utf-8
+
+## Regression test of the sorting against the results of the original
+## implementation (the baseline commit of this repository) on every
+## instance of Simulated_Instances/input_100, with both algorithms.
+## The whole result lines are compared (the input, the distance, the
+## sequence of operations, the approximation ratio and the error mark),
+## only the running time is left out. The reference keeps, for each
+## file and algorithm, the number of instances and a digest of each
+## block of BLOCK result lines, so that a difference is located within
+## a block without keeping the results themselves.
+##
+## The test runs with pytest (it takes a few minutes):
+##     python3 -m pytest tests/test_regression.py
+## The reference is written from a checkout of the code whose results
+## are taken as the reference, e.g. a git worktree of the baseline:
+##     python3 tests/test_regression.py --reference DIR
+
+import io
+import os
+import sys
+import json
+import time
+import getopt
+import hashlib
+import importlib
+import contextlib
+
+import pytest
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+REFERENCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'input_100_reference.json')
+DATASET = os.path.join(root, 'Simulated_Instances', 'input_100')
+FILES = ['10.in', '20.in', '30.in']
+VARIANTS = ['2.5', '3']
+
+## Result lines in each digest
+BLOCK = 100
+
+def read_instances(filename) :
+    with open(filename) as f :
+        for line in f :
+            if line.strip() :
+                yield [[int(value) for value in field.split(",")] for field in line.split()]
+
+## The result line without the running time (its seventh field)
+def strip_time(line) :
+    fields = line.split()
+    del fields[6]
+    return " ".join(fields)
+
+## Digests of the blocks of result lines
+def digests(lines) :
+    blocks = []
+    for start in range(0, len(lines), BLOCK) :
+        text = "\n".join(lines[start:start+BLOCK])
+        blocks.append(hashlib.sha256(text.encode()).hexdigest()[:16])
+    return blocks
+
+## Sorts the instances with the module found in directory, which may
+## be an older version printing the result line instead of returning
+## it.
+def reference_lines(directory, filename, is_3approx) :
+    sys.path.insert(0, directory)
+    module = importlib.import_module('rev_indel_intergenic')
+    lines = []
+    for permutation, wblack, wgray in read_instances(filename) :
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output) :
+            config, grayw, blackw = module.construct_str_cycle(permutation, wgray, wblack)
+            sort = module.Intergenic_Rev(config, grayw, blackw, len(wgray))
+            line = sort.sort(time.time(), is_3approx)
+        if not isinstance(line, str) :
+            line = output.getvalue().strip().splitlines()[-1]
+        lines.append(strip_time(line))
+    return lines
+
+def current_lines(filename, is_3approx) :
+    sys.path.insert(0, root)
+    from rev_indel_intergenic import sort_instance
+    lines = []
+    for permutation, wblack, wgray in read_instances(filename) :
+        lines.append(strip_time(sort_instance(permutation, wblack, wgray, is_3approx, time.time())))
+    return lines
+
+def case_name(name, variant) :
+    return "%s:%s" % (name, variant)
+
+@pytest.mark.parametrize("name", FILES)
+@pytest.mark.parametrize("variant", VARIANTS)
+def test_input_100(name, variant) :
+    with open(REFERENCE) as f :
+        reference = json.load(f)[case_name(name, variant)]
+    lines = current_lines(os.path.join(DATASET, name), variant == "3")
+
+    assert len(lines) == reference["instances"]
+    for block, (expected, found) in enumerate(zip(reference["digests"], digests(lines))) :
+        assert expected == found, "results differ from the reference in instances %d to %d of %s" % (
+            block * BLOCK + 1, min((block + 1) * BLOCK, len(lines)), name)
+
+if __name__ == '__main__':
+    try :
+        opts, args = getopt.getopt(sys.argv[1:], "", ["reference="])
+    except getopt.GetoptError as err :
+        print(err)
+        sys.exit(2)
+    directory = None
+    for opt, arg in opts :
+        if opt == "--reference" :
+            directory = os.path.abspath(arg)
+    if directory is None :
+        print("Usage: python3 tests/test_regression.py --reference DIR")
+        sys.exit(2)
+
+    reference = {}
+    for name in FILES :
+        for variant in VARIANTS :
+            lines = reference_lines(directory, os.path.join(DATASET, name), variant == "3")
+            reference[case_name(name, variant)] = {"instances" : len(lines), "digests" : digests(lines)}
+            sys.stderr.write("%s %d instances\n" % (case_name(name, variant), len(lines)))
+    os.makedirs(os.path.dirname(REFERENCE), exist_ok = True)
+    with open(REFERENCE, 'w') as f :
+        json.dump(reference, f, indent = 1, sort_keys = True)
+        f.write("\n")
@@ -0,0 +1,113 @@
+# encoding: utf-8
+
+## Tests of the cache of sorting results (result_cache.py), as used by
+## rev_indel_intergenic.sort_instance_result.
+##
+##     python3 -m pytest tests/test_result_cache.py
+
+import os
+import sys
+import time
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+import result_cache
+import result_format
+from rev_indel_intergenic import parse_instance, sort_instance_result, SOLVER_VERSION
+
+DATASET = os.path.join(root, 'Simulated_Instances', 'input_100', '10.in')
+
+def instances(count) :
+    with open(DATASET) as f :
+        return [parse_instance(next(f)) for _ in range(count)]
+
+def sort(instance, cache, distance_only = False) :
+    permutation, wblack, wgray = instance
+    return sort_instance_result(permutation, wblack, wgray, False, time.time(), cache,
+                                distance_only = distance_only)
+
+def test_miss_then_hit(tmp_path) :
+    cache = result_cache.ResultCache(str(tmp_path / "cache.sqlite"))
+    instance = instances(1)[0]
+
+    first = sort(instance, cache)
+    assert not first.cached
+    ## Results are only written by flush
+    assert len(cache) == 0
+    cache.flush()
+    assert len(cache) == 1
+
+    second = sort(instance, cache)
+    assert second.cached
+    ## Same line, including the time spent by the sorting that stored it
+    assert second.line() == first.line()
+
+    ## Another algorithm or version of the code is another entry
+    permutation, wblack, wgray = instance
+    keys = set(result_cache.instance_key(permutation, wblack, wgray, is_3approx, version)
+               for is_3approx in (False, True) for version in (SOLVER_VERSION, "other"))
+    assert len(keys) == 4
+    cache.close()
+
+def test_entry_without_sequence(tmp_path) :
+    cache = result_cache.ResultCache(str(tmp_path / "cache.sqlite"))
+    instance = instances(1)[0]
+
+    distance = sort(instance, cache, distance_only = True)
+    cache.flush()
+    permutation, wblack, wgray = instance
+    key = result_cache.instance_key(permutation, wblack, wgray, False, SOLVER_VERSION)
+    assert cache.get(key)[1] is None
+
+    ## Not used when the sequence is needed, which stores it
+    full = sort(instance, cache)
+    assert not full.cached
+    assert full.distance == distance.distance
+    cache.flush()
+    assert cache.get(key)[1] == full.sequence_text()
+
+    ## Used when it is not needed
+    again = sort(instance, cache, distance_only = True)
+    assert again.cached
+    assert again.distance == distance.distance
+    assert not again.has_sequence()
+    for kind in result_format.KINDS :
+        assert again.count(kind) == full.count(kind)
+    cache.close()
+
+def test_eviction(tmp_path) :
+    size = 100 + result_cache.ENTRY_OVERHEAD
+    cache = result_cache.ResultCache(str(tmp_path / "cache.sqlite"), max_size = 3 * size)
+    for name in "abc" :
+        cache.put(name, 1, "x" * 100, 1.0, 0.0)
+        cache.flush()
+        time.sleep(0.01)
+    assert len(cache) == 3
+    assert cache.total_size() == 3 * size
+
+    ## a is used, so b is now the least recently used result
+    assert cache.get("a") is not None
+    cache.flush()
+    time.sleep(0.01)
+    cache.put("d", 1, "x" * 100, 1.0, 0.0)
+    cache.flush()
+    assert cache.get("b") is None
+    assert all(cache.get(name) is not None for name in "acd")
+    assert cache.total_size() == 3 * size
+
+    ## Replacing a result does not count it twice
+    cache.put("d", 1, "x" * 100, 1.0, 0.0)
+    cache.flush()
+    assert len(cache) == 3
+    assert cache.total_size() == 3 * size
+    cache.close()
+
+def test_reopen(tmp_path) :
+    filename = str(tmp_path / "cache.sqlite")
+    cache = result_cache.ResultCache(filename)
+    cache.put("a", 4, None, 1.5, 0.25, "error")
+    cache.close()
+    cache = result_cache.ResultCache(filename)
+    assert cache.get("a") == (4, None, 1.5, 0.25, "error")
+    assert cache.total_size() == result_cache.ENTRY_OVERHEAD
+    cache.close()
@@ -0,0 +1,83 @@
+# encoding: utf-8
+
+## Round trips of the result formats (result_format.py): results
+## written in each format and read back with read_results must keep
+## their fields.
+##
+##     python3 -m pytest tests/test_result_format.py
+
+import os
+import sys
+import time
+
+import pytest
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+import result_format
+from rev_indel_intergenic import parse_instance, sort_instance_result
+
+DATASET = os.path.join(root, 'Simulated_Instances', 'input_100', '10.in')
+INSTANCES = 10
+
+## Results of both algorithms, one of them without its sequence, and a
+## result with an error mark
+def results() :
+    sorted_results = []
+    with open(DATASET) as f :
+        for _ in range(INSTANCES) :
+            permutation, wblack, wgray = parse_instance(next(f))
+            for is_3approx in (False, True) :
+                sorted_results.append(sort_instance_result(permutation, wblack, wgray, is_3approx,
+                                                           time.time()))
+            sorted_results.append(sort_instance_result(permutation, wblack, wgray, False, time.time(),
+                                                       distance_only = True))
+    sorted_results.append(result_format.SortResult(3, 2, 1.5, 0.125, result_format.NOT_SORTED,
+                                                   [("REV", 1, 2, 0, 0)],
+                                                   input = ("(1,2)", "0,0", "0,0")))
+    return sorted_results
+
+def round_trip(tmp_path, output_format, with_sequence, original) :
+    filename = str(tmp_path / ("results." + output_format))
+    writer = result_format.open_writer(output_format, filename, with_sequence)
+    for result in original :
+        writer.write(result)
+    writer.close()
+    return list(result_format.read_results(filename))
+
+@pytest.mark.parametrize("with_sequence", [True, False])
+def test_text(tmp_path, with_sequence) :
+    original = results()
+    read = round_trip(tmp_path, "text", with_sequence, original)
+    assert [result.line() for result in read] == [result.line(with_sequence) for result in original]
+    for expected, found in zip(original, read) :
+        assert found.distance == expected.distance
+        assert found.lower_bound == expected.lower_bound
+        assert found.status == expected.status
+        if with_sequence and expected.has_sequence() :
+            assert found.operations == expected.operations
+
+@pytest.mark.parametrize("with_sequence", [True, False])
+def test_jsonl(tmp_path, with_sequence) :
+    original = results()
+    read = round_trip(tmp_path, "jsonl", with_sequence, original)
+    assert [result.to_dict() for result in read] == [result.to_dict(with_sequence) for result in original]
+
+@pytest.mark.parametrize("with_sequence", [True, False])
+def test_binary(tmp_path, with_sequence) :
+    original = results()
+    read = round_trip(tmp_path, "binary", with_sequence, original)
+    assert len(read) == len(original)
+    for expected, found in zip(original, read) :
+        assert (found.distance, found.lower_bound, found.ratio, found.seconds, found.status) == (
+            expected.distance, expected.lower_bound, expected.ratio, expected.seconds, expected.status)
+        if with_sequence and expected.has_sequence() :
+            ## The float values of some sequences are written as int32
+            assert found.operations == expected.operations
+        else :
+            assert not found.has_sequence()
+
+def test_cached_flag(tmp_path) :
+    result = results()[0]
+    result.cached = True
+    assert round_trip(tmp_path, "jsonl", True, [result])[0].cached